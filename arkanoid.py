@@ -1,24 +1,44 @@
 import sys
 import os.path
+import time
 
 from PyQt5.QtCore import QUrl
-from PyQt5.QtMultimedia import QMediaContent
 from PyQt5.QtWidgets import (
     QApplication,
+    QLabel,
     QPushButton,
     QVBoxLayout,
     QStackedLayout,
     QWidget,
     QDesktopWidget,
     QMessageBox)
-from PyQt5.QtGui import QPainter, QImage, QBrush, QPalette, QFont, QColor
-from PyQt5.QtCore import Qt, QRectF, QTimer
-from PyQt5.QtMultimedia import QMediaPlayer, QMediaPlaylist
+from PyQt5.QtGui import (
+    QPainter,
+    QBrush,
+    QPalette,
+    QFont,
+    QColor,
+    QRegion)
+from PyQt5.QtCore import Qt, QTimer, QElapsedTimer, QLineF, pyqtSignal
+import settings
+from assets import AssetLoader
 from game import GameModel
+from loop import FixedStepLoop
+from renderers import RENDERERS
+from replay import ReplayRecorder
+from scores import HighScores, create_score
+from sound import SoundEngine
+from spectator import SpectatorServer
+from sprites import SpriteAtlas
 from core import Size, BallState
 
+HUD_HEIGHT = 32
+LAST_REPLAY_PATH = 'last_game.replay'
+
 
 class Window(QWidget):
+    scores_loaded = pyqtSignal()
+
     def __init__(self):
         super().__init__()
 
@@ -32,6 +52,7 @@ class Window(QWidget):
         self.right = False
         self.timer = QTimer()
         self.timer.timeout.connect(self.tick)
+        self.clock = QElapsedTimer()
         self.setWindowTitle('Arkanoid')
 
         self.main_menu = QWidget(self)
@@ -39,13 +60,72 @@ class Window(QWidget):
         self.game_widget.setMouseTracking(True)
         self.game_widget.mouseMoveEvent = self.mouse_move_event
         self.mouse_x = None
+        self.logo = None
+        self.media_player = None
+        self.sound = None
+        self.scores_loaded.connect(self.update_leaderboard)
+        self.high_scores = HighScores(settings.HIGH_SCORES_PATH,
+                                      on_load=self.scores_loaded.emit)
+        QApplication.instance().aboutToQuit.connect(self.high_scores.close)
+        self.started_at = None
+
+        self.game = None
+        self.recorder = None
+        self.loop = None
+
+        self.painter = QPainter()
+        self.sprites = SpriteAtlas()
+        self.renderer = RENDERERS[settings.RENDERER](self.sprites,
+                                                     self.game_widget)
+        if self.renderer.widget is not None:
+            game_layout = QVBoxLayout(self.game_widget)
+            game_layout.setContentsMargins(0, 0, 0, 0)
+            game_layout.addWidget(self.renderer.widget)
+
+        self.spectators = None
+        if settings.SPECTATOR_PORT is not None:
+            self.spectators = SpectatorServer()
+            self.spectators.start_in_thread('', settings.SPECTATOR_PORT)
+
+        self.stacked = QStackedLayout(self)
+        self.stacked.addWidget(self.game_widget)
+        self.set_main_menu_layout()
+        self.stacked.setCurrentWidget(self.main_menu)
 
+        self.showFullScreen()
+
+        self.loader = AssetLoader(self)
+        self.loader.loaded.connect(self.assets_loaded)
+        self.loader.start()
+
+    def assets_loaded(self, images):
+        self.sprites.images.update(images)
         palette = QPalette()
         palette.setBrush(self.backgroundRole(),
-                         QBrush(QImage(os.path.join('images', 'space.png'))))
+                         QBrush(self.sprites.get_image(
+                             os.path.join('images', 'space.png'))))
         self.setPalette(palette)
-        self.logo = QImage(os.path.join('images', 'logo.png'))
+        self.logo = self.sprites.get_image(os.path.join('images', 'logo.png'))
+        self.start_music()
+        self.start_sound()
+        self.update()
 
+    def start_sound(self):
+        self.sound = SoundEngine(self.game.events if self.game else None)
+        QApplication.instance().aboutToQuit.connect(self.stop_sound)
+        self.sound.start()
+
+    def stop_sound(self):
+        self.sound.stop()
+
+    def start_music(self):
+        try:
+            from PyQt5.QtMultimedia import (
+                QMediaContent,
+                QMediaPlayer,
+                QMediaPlaylist)
+        except ImportError:
+            return
         self.media_player = QMediaPlayer()
         playlist = QMediaPlaylist()
         playlist.addMedia(QMediaContent(QUrl('space_music.mp3')))
@@ -54,28 +134,33 @@ class Window(QWidget):
         # self.media_player.setPlaylist(playlist)
         self.media_player.play()
 
-        self.game = GameModel(Size(self.width(), self.height()))
-
-        self.painter = QPainter()
-
-        self.stacked = QStackedLayout(self)
-        self.stacked.addWidget(self.game_widget)
-        self.set_main_menu_layout()
-        self.stacked.setCurrentWidget(self.main_menu)
-
-        self.showFullScreen()
-
     def start(self):
+        self.started_at = time.monotonic()
         self.game = GameModel(Size(self.width(), self.height()))
+        if self.sound is not None:
+            self.sound.attach(self.game.events)
+        self.recorder = ReplayRecorder(self.game)
+        self.loop = FixedStepLoop(self.game, tick=self.recorder.tick)
         self.left = self.right = False
         self.change_current_widget(self.game_widget)
         self.started = True
-        self.timer.start(12)
+        self.clock.start()
+        self.timer.start(settings.FRAME_INTERVAL)
+
+    def save_score(self):
+        self.high_scores.submit(self.recorder.replay.save, LAST_REPLAY_PATH)
+        rank = self.high_scores.add(create_score(
+            self.game, time.monotonic() - self.started_at))
+        self.update_leaderboard()
+        if rank is None:
+            return ''
+        return ' Rank: %s.' % rank
 
     def try_restart(self):
-        reply = QMessageBox.question(self, 'Restart', 'Your score: %s. '
+        rank = self.save_score()
+        reply = QMessageBox.question(self, 'Restart', 'Your score: %s.%s '
                                      'Do you want to restart?'
-                                     % self.game.player.score,
+                                     % (self.game.player.score, rank),
                                      QMessageBox.Yes | QMessageBox.No)
         if reply == QMessageBox.Yes:
             self.start()
@@ -83,8 +168,9 @@ class Window(QWidget):
             self.change_current_widget(self.main_menu)
 
     def notify_win(self):
-        QMessageBox.information(self, 'Win', 'You win. Your score: %s'
-                                % self.game.player.score)
+        rank = self.save_score()
+        QMessageBox.information(self, 'Win', 'You win. Your score: %s.%s'
+                                % (self.game.player.score, rank))
         self.started = False
         self.change_current_widget(self.main_menu)
 
@@ -97,14 +183,23 @@ class Window(QWidget):
 
     def tick(self):
         if self.game.gameover:
-            self.try_restart()
             self.timer.stop()
+            self.try_restart()
+            return
         if self.game.won:
-            self.notify_win()
             self.timer.stop()
+            self.notify_win()
+            return
         turn_rate = 1 if self.right else -1 if self.left else 0
-        self.game.tick(turn_rate)
-        self.repaint()
+        ticks = self.loop.advance(self.clock.restart(), turn_rate)
+        if ticks and self.spectators is not None:
+            self.spectators.publish_threadsafe(self.game)
+        self.update(self.get_dirty_region())
+
+    def get_dirty_region(self):
+        region = QRegion(0, 0, self.width(), HUD_HEIGHT)
+        return region + self.renderer.update(self.game, self.size(),
+                                             self.loop.get_location)
 
     def change_current_widget(self, widget):
         self.stacked.setCurrentWidget(widget)
@@ -113,23 +208,34 @@ class Window(QWidget):
     def set_main_menu_layout(self):
         vbox = QVBoxLayout(self.main_menu)
 
+        self.leaderboard = QLabel()
+        self.leaderboard.setStyleSheet('font-size: 20px;'
+                                       'color: rgb(255, 215, 0);')
+        vbox.addWidget(self.leaderboard, alignment=Qt.AlignCenter)
+        self.update_leaderboard()
         self.add_button('Start', self.start, vbox)
         self.add_button('Quit', self.quit, vbox)
 
         vbox.setAlignment(Qt.AlignCenter)
         self.stacked.addWidget(self.main_menu)
 
+    def update_leaderboard(self):
+        lines = ['%2s. %8s   level %s' % (rank, score.score, score.level)
+                 for rank, score in enumerate(self.high_scores, 1)]
+        self.leaderboard.setText('\n'.join(lines))
+        self.leaderboard.setVisible(bool(lines))
+
     def mouse_move_event(self, event):
-        current_mouse_x = event.x()
-        old_x = self.game.ship.x
-        self.game.ship.location = (current_mouse_x, self.game.ship.y)
-        delta_x = self.game.ship.x - old_x
-        if self.game.ball.state == BallState.Caught:
-            self.game.ball.move(delta_x)
+        if self.recorder is not None:
+            self.recorder.move_ship_to(event.x())
 
     def mousePressEvent(self, event):
-        if not self.game.release_ball():
-            self.game.shooting()
+        if self.game is None:
+            return
+        if self.game.ball.state == BallState.Caught:
+            self.recorder.release_ball()
+        else:
+            self.recorder.shooting()
 
     def keyPressEvent(self, event):
         key = event.key()
@@ -139,15 +245,16 @@ class Window(QWidget):
             self.timer.stop()
             self.started = False
             self.change_current_widget(self.main_menu)
-        if key == Qt.Key_Space:
-            self.game.release_ball()
-        if key == Qt.Key_X:
-            self.game.shooting()
-        if key == Qt.Key_P:
+        if key == Qt.Key_Space and self.recorder is not None:
+            self.recorder.release_ball()
+        if key == Qt.Key_X and self.recorder is not None:
+            self.recorder.shooting()
+        if key == Qt.Key_P and self.started:
             self.paused = not self.paused
             if self.paused:
                 self.timer.stop()
             else:
+                self.clock.restart()
                 self.timer.start()
         if key == Qt.Key_Q:
             self.quit()
@@ -161,44 +268,43 @@ class Window(QWidget):
 
     def paintEvent(self, event):
         self.painter.begin(self)
-        self.draw()
+        self.draw(event.rect())
         self.painter.end()
 
-    def draw(self):
+    def draw(self, rect):
         self.painter.setRenderHint(self.painter.Antialiasing)
         self.painter.setFont(QFont('Times New Roman', 20))
         self.painter.setPen(QColor('gold'))
 
         if not self.started:
-            self.painter.drawImage((self.width() - self.logo.width()) / 2, 50,
-                                   self.logo)
+            if self.logo is not None:
+                self.painter.drawImage(
+                    (self.width() - self.logo.width()) // 2, 50, self.logo)
             return
 
         self.painter.drawText(0, 20, 'Scores: %s'
                               % str(self.game.player.score))
 
         game = self.game
-        self.painter.drawLine(game.frame.left, game.deadly_height,
-                              game.frame.right, game.deadly_height)
+        self.painter.drawLine(QLineF(game.frame.left, game.deadly_height,
+                                     game.frame.right, game.deadly_height))
 
         if self.game.gameover:
             return
 
-        life_img = QImage(os.path.join('images', 'lifebonus.png'))
-        draw_x = self.width() - life_img.width()
+        life_path = os.path.join('images', 'lifebonus.png')
+        life_width = self.sprites.get_image(life_path).width()
+        draw_x = self.width() - life_width
         draw_y = 0
         for _ in range(self.game.player.lives):
-            self.painter.drawImage(draw_x, draw_y, life_img)
-            draw_x -= life_img.width()
+            self.sprites.draw_image(self.painter, draw_x, draw_y, life_path)
+            draw_x -= life_width
 
-        self.draw_game_elements()
+        self.draw_game_elements(rect)
 
-    def draw_game_elements(self):
-        for entity in self.game.get_entities():
-            self.painter.drawImage(QRectF(*entity.location,
-                                          entity.frame.width,
-                                          entity.frame.height),
-                                   QImage(entity.get_image()))
+    def draw_game_elements(self, rect):
+        self.renderer.draw(self.painter, self.game, rect, self.size(),
+                           self.loop.get_location)
 
     @staticmethod
     def add_button(text, callback, layout, alignment=Qt.AlignCenter):
@@ -0,0 +1,30 @@
+import os
+from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtGui import QImage
+from level import LEVELS
+
+IMAGE_DIRECTORY = 'images'
+IMAGE_EXTENSIONS = ('.png', '.jpg')
+
+
+def get_image_paths(directory=IMAGE_DIRECTORY):
+    return [os.path.join(directory, name)
+            for name in sorted(os.listdir(directory))
+            if os.path.splitext(name)[1] in IMAGE_EXTENSIONS]
+
+
+class AssetLoader(QThread):
+    loaded = pyqtSignal(dict)
+
+    def __init__(self, parent=None, paths=None, levels=LEVELS):
+        super().__init__(parent)
+        self.paths = paths
+        self.levels = levels
+
+    def run(self):
+        images = {}
+        for path in self.paths or get_image_paths():
+            images[path] = QImage(path)
+        for number in self.levels.paths:
+            self.levels.get_layout(number)
+        self.loaded.emit(images)
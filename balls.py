@@ -0,0 +1,123 @@
+from array import array
+from core import BallState, Frame, Vector
+
+FIELDS = ('x', 'y', 'width', 'height', 'dx', 'dy', 'velocity', 'state')
+TYPECODES = ('d', 'd', 'l', 'l', 'd', 'd', 'd', 'b')
+STATES = tuple(BallState)
+
+
+def _field(name):
+    def get(view):
+        return getattr(view.store, name)[view.index]
+
+    def set(view, value):
+        getattr(view.store, name)[view.index] = value
+
+    return property(get, set)
+
+
+class BallFrame(Frame):
+    __slots__ = ('store', 'index')
+
+    x = _field('x')
+    y = _field('y')
+    width = _field('width')
+    height = _field('height')
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def __reduce__(self):
+        return type(self), (self.store, self.index)
+
+
+class BallDirection(Vector):
+    __slots__ = ('store', 'index')
+
+    x = _field('dx')
+    y = _field('dy')
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def __reduce__(self):
+        return type(self), (self.store, self.index)
+
+
+class BallArray:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.count = 0
+        self.items = [None] * capacity
+        for name, typecode in zip(FIELDS, TYPECODES):
+            setattr(self, name, array(typecode, [0] * capacity))
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return self.items[index]
+
+    def __iter__(self):
+        items = self.items
+        for index in range(self.count):
+            yield items[index]
+
+    def __contains__(self, ball):
+        return ball.store is self
+
+    def copy_to(self, index, store, store_index):
+        for name in FIELDS:
+            getattr(store, name)[store_index] = getattr(self, name)[index]
+
+    def add(self, ball):
+        if self.count == self.capacity:
+            return False
+        index = self.count
+        if ball.store is not None:
+            ball.store.copy_to(ball.index, self, index)
+        self.items[index] = ball
+        self.count += 1
+        ball.bind(self, index)
+        return True
+
+    def detach(self, index):
+        ball = self.items[index]
+        ball.bind(None, None)
+        BallArray(1).add(ball)
+        self.copy_to(index, ball.store, 0)
+
+    def remove(self, indices):
+        removed = set(indices)
+        kept = 0
+        for index in range(self.count):
+            if index in removed:
+                self.detach(index)
+                continue
+            if kept != index:
+                self.copy_to(index, self, kept)
+                self.items[kept] = self.items[index]
+                self.items[kept].bind(self, kept)
+            kept += 1
+        for index in range(kept, self.count):
+            self.items[index] = None
+        self.count = kept
+
+    def clear(self):
+        self.remove(range(self.count))
+
+    def snapshot(self):
+        return tuple(getattr(self, name)[:self.count] for name in FIELDS)
+
+    def restore(self, fields, factory):
+        count = len(fields[0])
+        if self.count > count:
+            self.remove(range(count, self.count))
+        while self.count < count:
+            self.add(factory())
+        for name, values in zip(FIELDS, fields):
+            getattr(self, name)[:count] = values
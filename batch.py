@@ -0,0 +1,343 @@
+from math import pi
+import numpy as np
+import settings
+import bonuses
+from core import Frame, BallState
+from level import LevelCreator
+
+
+class BatchGameModel:
+    def __init__(self, count, size, seed=None, max_bullets=32, max_bonuses=16,
+                 max_effects=16):
+        self.count = count
+        self.size = size
+        self.frame = Frame(0, 0, *size)
+        self.rng = np.random.default_rng(seed)
+        self.bonus_chance = 0.25
+        self.bonus_pool = np.array(
+            [kind for kind, bonus_cls in enumerate(bonuses.BONUSES)
+             if bonus_cls is not bonuses.MultiBallBonus])
+
+        self.ship_y = size.height - settings.SHIP_SIZE.height
+        self.deadly_height = self.ship_y + settings.SHIP_SIZE.height / 2
+
+        self._load_levels(LevelCreator.get_levels(size))
+
+        self.score = np.zeros(count, dtype=np.int64)
+        self.lives = np.full(count, 3, dtype=np.int64)
+        self.current_level = np.ones(count, dtype=np.int64)
+        self.won = np.zeros(count, dtype=bool)
+        self.alive = self.level_masks[np.zeros(count, dtype=np.int64)]
+
+        self.ship_x = np.zeros(count)
+        self.ship_width = np.zeros(count)
+        self.ammo = np.zeros(count, dtype=np.int64)
+        self.ball = np.zeros((count, 2))
+        self.ball_direction = np.zeros((count, 2))
+        self.ball_velocity = np.zeros(count)
+        self.ball_state = np.zeros(count, dtype=np.int64)
+
+        self.bullets = np.zeros((count, max_bullets, 2))
+        self.bullets_active = np.zeros((count, max_bullets), dtype=bool)
+        self.bonuses = np.zeros((count, max_bonuses, 2))
+        self.bonus_kinds = np.zeros((count, max_bonuses), dtype=np.int64)
+        self.bonuses_active = np.zeros((count, max_bonuses), dtype=bool)
+
+        self.ticks = np.zeros(count, dtype=np.int64)
+        self.effect_kinds = np.zeros((count, max_effects), dtype=np.int64)
+        self.effect_expires = np.zeros((count, max_effects), dtype=np.int64)
+        self.effect_deltas = np.zeros((count, max_effects, 2))
+        self.effects_active = np.zeros((count, max_effects), dtype=bool)
+
+        self.reset(np.ones(count, dtype=bool))
+
+    def _load_levels(self, levels):
+        self.levels_count = len(levels)
+        max_blocks = max(len(level.blocks) for level in levels.values())
+        self.blocks = np.zeros((self.levels_count, max_blocks, 2))
+        self.level_masks = np.zeros((self.levels_count, max_blocks),
+                                    dtype=bool)
+        for index, lvl in enumerate(sorted(levels)):
+            blocks = sorted(levels[lvl].blocks, key=lambda b: (b.y, b.x))
+            for position, block in enumerate(blocks):
+                self.blocks[index, position] = block.x, block.y
+            self.level_masks[index, :len(blocks)] = True
+
+    @property
+    def gameover(self):
+        return self.lives == 0
+
+    @property
+    def active(self):
+        return ~(self.gameover | self.won)
+
+    def get_blocks(self, games=slice(None)):
+        return self.blocks[np.minimum(self.current_level[games],
+                                      self.levels_count) - 1]
+
+    def reset(self, mask):
+        self.bullets_active[mask] = False
+        self.bonuses_active[mask] = False
+        self.effects_active[mask] = False
+
+        self.ship_x[mask] = (self.size.width - settings.SHIP_SIZE.width) / 2
+        self.ship_width[mask] = settings.SHIP_SIZE.width
+        self.ammo[mask] = 0
+
+        self.ball[mask, 0] = self.ship_x[mask] + \
+            (settings.SHIP_SIZE.width - settings.BALL_SIZE.width) / 2
+        self.ball[mask, 1] = self.ship_y - settings.BALL_SIZE.height
+        self.ball_direction[mask] = settings.BALL_DIRECTION
+        self.ball_velocity[mask] = settings.BALL_VELOCITY
+        self.ball_state[mask] = BallState.Caught.value
+
+    def kill_player(self, mask):
+        self.lives[mask] -= 1
+        self.reset(mask)
+
+    def release_ball(self, mask):
+        released = mask & (self.ball_state == BallState.Caught.value)
+        self.ball_state[released] = BallState.Free.value
+        return released
+
+    def shooting(self, mask):
+        shooting = mask & (self.ammo > 0)
+        self.ammo[shooting] -= 2
+        for x in (self.ship_x, self.ship_x + self.ship_width):
+            slots = self._allocate(self.bullets_active, shooting)
+            games = np.flatnonzero(slots >= 0)
+            self.bullets[games, slots[games]] = np.column_stack(
+                (x[games], np.full(len(games), self.ship_y)))
+            self.bullets_active[games, slots[games]] = True
+
+    def step(self, turn_rates=0, release=None, shoot=None):
+        active = self.active
+        if release is not None:
+            self.release_ball(active & release)
+        if shoot is not None:
+            self.shooting(active & shoot)
+
+        self._update_effects(active)
+        old_x = self.ship_x.copy()
+        self.ship_x[active] += settings.SHIP_VELOCITY * \
+            np.broadcast_to(turn_rates, self.count)[active]
+        np.clip(self.ship_x, 0, self.frame.right - self.ship_width,
+                out=self.ship_x)
+        self._move_ball(active, self.ship_x - old_x)
+        self._try_reflect_ball(active)
+
+        middle = self.ball[:, 1] + settings.BALL_SIZE.height - \
+            int(settings.BALL_SIZE.height / 2)
+        self.kill_player(active & (middle > self.deadly_height))
+
+        self._try_complete_levels(active)
+        self._smash_blocks(active)
+        self._remove_bonuses(active)
+        self._remove_bullets(active)
+        self._reflect_from_ship(active)
+
+    def _update_effects(self, active):
+        self.ticks[active] += 1
+        expired = self.effects_active & active[:, None] & \
+            (self.effect_expires <= self.ticks[:, None])
+        if not expired.any():
+            return
+        self.effects_active &= ~expired
+        games, slots = np.nonzero(expired)
+        deltas = self.effect_deltas[games, slots]
+        np.subtract.at(self.ship_x, games, deltas[:, 0])
+        np.subtract.at(self.ship_width, games, deltas[:, 1])
+
+        kinds = self.effect_kinds
+        for bonus_cls in (bonuses.FireBallBonus, bonuses.FastBallBonus):
+            kind = bonuses.BONUSES.index(bonus_cls)
+            ended = (expired & (kinds == kind)).any(axis=1) & \
+                ~(self.effects_active & (kinds == kind)).any(axis=1)
+            if bonus_cls is bonuses.FireBallBonus:
+                self.ball_state[ended & (self.ball_state ==
+                                         BallState.Fiery.value)] = \
+                    BallState.Free.value
+            else:
+                self.ball_velocity[ended] = settings.BALL_VELOCITY
+
+    def _schedule_effect(self, bonus_cls, mask, deltas=None):
+        if bonus_cls.duration is None:
+            return
+        games = np.flatnonzero(mask)
+        slots = self._allocate(self.effects_active, mask)[games]
+        placed = slots >= 0
+        games, slots = games[placed], slots[placed]
+        self.effect_kinds[games, slots] = bonuses.BONUSES.index(bonus_cls)
+        self.effect_expires[games, slots] = \
+            self.ticks[games] + bonus_cls.duration
+        self.effect_deltas[games, slots] = \
+            0 if deltas is None else deltas[placed]
+        self.effects_active[games, slots] = True
+
+    def _move_ball(self, active, ship_delta):
+        caught = active & (self.ball_state == BallState.Caught.value)
+        free = active & ~caught
+        self.ball[caught, 0] += ship_delta[caught]
+        direction = self.ball_direction[free]
+        length = np.hypot(direction[:, 0], direction[:, 1])[:, None]
+        self.ball[free] += direction / length * \
+            self.ball_velocity[free, None]
+
+    def _try_reflect_ball(self, active):
+        x, y = self.ball[:, 0], self.ball[:, 1]
+        dx, dy = self.ball_direction[:, 0], self.ball_direction[:, 1]
+        flip_x = active & (
+            (dx > 0) & (x + settings.BALL_SIZE.width > self.frame.right) |
+            (dx < 0) & (x < self.frame.left))
+        flip_y = active & (dy < 0) & (y < self.frame.top + 0.1)
+        dx[flip_x] = -dx[flip_x]
+        dy[flip_y] = -dy[flip_y]
+
+    def _try_complete_levels(self, active):
+        completed = active & ~self.alive.any(axis=1)
+        self.score[completed] += 1000 * self.current_level[completed]
+        self.current_level[completed] += 1
+        next_level = completed & (self.current_level <= self.levels_count)
+        self.alive[next_level] = \
+            self.level_masks[self.current_level[next_level] - 1]
+        self.reset(next_level)
+        self.won |= completed & ~next_level
+
+    def _smash_blocks(self, active):
+        games = np.flatnonzero(active)
+        blocks = self.get_blocks(games)
+        hits = self.alive[games] & _intersects(
+            self.ball[games, None, :], settings.BALL_SIZE,
+            blocks, settings.BRICK_SIZE)
+        smashing = hits.any(axis=1)
+        games, blocks, hits = games[smashing], blocks[smashing], hits[smashing]
+        if len(games) == 0:
+            return
+        block = blocks[np.arange(len(games)), hits.argmax(axis=1)]
+
+        not_fiery = self.ball_state[games] != BallState.Fiery.value
+        bounced, block_x = games[not_fiery], block[not_fiery, 0]
+        direction = self.ball_direction[bounced]
+        direction /= np.hypot(direction[:, 0], direction[:, 1])[:, None]
+        delta_x = self.ball[bounced, 0] + settings.BALL_SIZE.width / 2 - \
+            (block_x + settings.BRICK_SIZE.width / 2)
+        vertical = np.abs(delta_x) - self.ball_velocity[bounced] * \
+            np.abs(np.cos(direction[:, 0])) <= settings.BRICK_SIZE.width / 2
+        direction[vertical, 1] = -direction[vertical, 1]
+        direction[~vertical, 0] = -direction[~vertical, 0]
+        self.ball_direction[bounced] = direction
+
+        self.alive[games] &= ~hits
+        self._get_scores(games, hits.sum(axis=1))
+        self._try_get_bonus(games, block)
+
+    def _get_scores(self, games, blocks_count):
+        self.score[games] += 30 * blocks_count
+
+    def _try_get_bonus(self, games, block):
+        lucky = self.rng.random(len(games)) > 1 - self.bonus_chance
+        games, block = games[lucky], block[lucky]
+        spawn = np.zeros(self.count, dtype=bool)
+        spawn[games] = True
+        slots = self._allocate(self.bonuses_active, spawn)[games]
+        placed = slots >= 0
+        games, slots = games[placed], slots[placed]
+        self.bonuses[games, slots] = block[placed]
+        self.bonus_kinds[games, slots] = self.bonus_pool[self.rng.integers(
+            0, len(self.bonus_pool), len(games))]
+        self.bonuses_active[games, slots] = True
+
+    def _remove_bonuses(self, active):
+        bonuses_active = self.bonuses_active & active[:, None]
+        outside = bonuses_active & ~_intersects(
+            self.bonuses, settings.BONUS_SIZE,
+            np.zeros(2), self.size)
+        self.bonuses[bonuses_active, 1] += settings.BONUS_VELOCITY
+
+        for slot in range(self.bonuses.shape[1]):
+            if not self.bonuses_active[:, slot].any():
+                continue
+            caught = self.bonuses_active[:, slot] & active & _intersects(
+                self.bonuses[:, slot], settings.BONUS_SIZE,
+                np.column_stack((self.ship_x, np.full(self.count,
+                                                      self.ship_y))),
+                (self.ship_width, settings.SHIP_SIZE.height))
+            self.bonuses_active[caught, slot] = False
+            kinds = self.bonus_kinds[:, slot]
+            for kind, bonus_cls in enumerate(bonuses.BONUSES):
+                self._activate(bonus_cls, caught & (kinds == kind))
+
+        self.bonuses_active &= ~outside
+
+    def _activate(self, bonus_cls, mask):
+        if not mask.any():
+            return
+        if bonus_cls in (bonuses.DecreaseBonus, bonuses.ExpandBonus):
+            half_width = self.ship_width[mask] / 2
+            if bonus_cls is bonuses.ExpandBonus:
+                half_width = -half_width
+            deltas = np.column_stack((half_width,
+                                      -half_width.astype(np.int64)))
+            self.ship_x[mask] += deltas[:, 0]
+            self.ship_width[mask] += deltas[:, 1]
+            self._schedule_effect(bonus_cls, mask, deltas)
+        elif bonus_cls is bonuses.BulletBonus:
+            self.ammo[mask] += 12
+        elif bonus_cls is bonuses.FireBallBonus:
+            self.ball_state[mask] = BallState.Fiery.value
+            self._schedule_effect(bonus_cls, mask)
+        elif bonus_cls is bonuses.FastBallBonus:
+            self.ball_velocity[mask] = 1.5 * settings.BALL_VELOCITY
+            self._schedule_effect(bonus_cls, mask)
+        elif bonus_cls is bonuses.LifeBonus:
+            self.lives[mask] += 1
+        elif bonus_cls is bonuses.DeathBonus:
+            self.kill_player(mask)
+
+    def _remove_bullets(self, active):
+        bullets_active = self.bullets_active & active[:, None]
+        outside = bullets_active & ~_intersects(
+            self.bullets, settings.BULLET_SIZE, np.zeros(2), self.size)
+        self.bullets[bullets_active, 1] -= settings.BULLET_VELOCITY
+
+        games, slots = np.nonzero(bullets_active)
+        hits = self.alive[games] & _intersects(
+            self.bullets[games, slots, None, :], settings.BULLET_SIZE,
+            self.get_blocks(games), settings.BRICK_SIZE)
+        hit_bullets = hits.any(axis=1)
+        self.bullets_active[games[hit_bullets], slots[hit_bullets]] = False
+        smashed = np.zeros_like(self.alive)
+        np.logical_or.at(smashed, games, hits)
+        self.alive &= ~smashed
+        self.bullets_active &= ~outside
+
+    def _reflect_from_ship(self, active):
+        ship = np.column_stack((self.ship_x, np.full(self.count,
+                                                     self.ship_y)))
+        hit = active & _intersects(self.ball, settings.BALL_SIZE, ship,
+                                   (self.ship_width,
+                                    settings.SHIP_SIZE.height))
+        mid = self.ship_x[hit] + self.ship_width[hit] / 2
+        ball_mid = self.ball[hit, 0] + settings.BALL_SIZE.width / 2
+        angle = -pi / 2 + pi / 2.75 * (ball_mid - mid) / \
+            (self.ship_width[hit] / 2)
+        self.ball_direction[hit] = np.column_stack((np.cos(angle),
+                                                    np.sin(angle)))
+
+    @staticmethod
+    def _allocate(slots_active, mask):
+        free = ~slots_active
+        slots = free.argmax(axis=1)
+        slots[~(mask & free.any(axis=1))] = -1
+        return slots
+
+
+def _intersects(location, size, other_location, other_size):
+    width, height = size
+    other_width, other_height = other_size
+    x, y = location[..., 0], location[..., 1]
+    other_x, other_y = other_location[..., 0], other_location[..., 1]
+    return (np.minimum(x + width, other_x + other_width) >=
+            np.maximum(x, other_x)) & \
+        (np.minimum(y + height, other_y + other_height) >=
+         np.maximum(y, other_y))
@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+START = time.perf_counter()
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TIMEOUT = 10000
+
+
+def measure():
+    from PyQt5.QtCore import QTimer
+    from PyQt5.QtWidgets import QApplication
+
+    os.chdir(ROOT)
+    app = QApplication(sys.argv)
+    timings = {'qt': time.perf_counter() - START}
+    import arkanoid
+    arkanoid.APP = app
+    timings['import'] = time.perf_counter() - START
+
+    paint_event = arkanoid.Window.paintEvent
+
+    def first_paint(window, event):
+        paint_event(window, event)
+        timings.setdefault('first_frame', time.perf_counter() - START)
+        if 'assets' in timings:
+            app.quit()
+
+    def assets_loaded(images):
+        timings['assets'] = time.perf_counter() - START
+        if 'first_frame' in timings:
+            app.quit()
+
+    arkanoid.Window.paintEvent = first_paint
+    window = arkanoid.Window()
+    timings['window'] = time.perf_counter() - START
+    window.loader.loaded.connect(assets_loaded)
+    QTimer.singleShot(TIMEOUT, app.quit)
+    app.exec_()
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Arkanoid startup time')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output', help='write results to a JSON file')
+    parser.add_argument('--child', action='store_true',
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(measure()))
+        return 0
+
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    runs = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, __file__, '--child'], env=env,
+                                stdout=subprocess.PIPE, check=True).stdout
+        runs.append(json.loads(output.decode().splitlines()[-1]))
+
+    results = {}
+    for name in ('qt', 'import', 'window', 'first_frame', 'assets'):
+        values = [run[name] for run in runs if name in run]
+        if values:
+            results[name] = statistics.median(values)
+            print('%-12s %8.1f ms' % (name, results[name] * 1000))
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'runs': runs, 'median': results}, file, indent=2,
+                      sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
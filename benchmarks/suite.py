@@ -0,0 +1,320 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import timeit
+from math import pi
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import settings
+from bonuses import BONUSES
+from core import Size, Frame, BallState, Vector
+from entities import Bullet, Ball
+from game import GameModel
+from level import LevelCreator
+from levelgen import LevelGenerator, generate_layout
+
+GAME_SIZE = Size(1280, 800)
+STRESS_SIZE = Size(12800, 4000)
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(function):
+        BENCHMARKS[name] = function
+        return function
+    return register
+
+
+def play(game, ticks):
+    for _ in range(ticks):
+        target = game.ball.x + (game.ball.width - game.ship.width) / 2
+        game.tick(1 if game.ship.x < target else -1)
+        if game.ball.state == BallState.Caught:
+            game.release_ball()
+
+
+def rate(operations, run, repeat=7):
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    return operations / best
+
+
+def rate_with_setup(operations, setup, run, repeat=7):
+    best = None
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        run(state)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return operations / best
+
+
+def create_game(level=1, seed=0):
+    game = GameModel(GAME_SIZE, seed=seed)
+    game.current_level = level
+    game.level = game.levels.get_level(level, GAME_SIZE)
+    game.release_ball()
+    return game
+
+
+def register_level_benchmarks():
+    for level in LevelCreator.get_levels(GAME_SIZE):
+        def run_level(level=level, ticks=1000):
+            return rate_with_setup(ticks, lambda: create_game(level),
+                                   lambda game: play(game, ticks))
+        benchmark('tick.level%s' % level)(run_level)
+
+
+def register_scaling_benchmarks(counts=(10, 100, 1000)):
+    def with_bullets(count):
+        game = create_game()
+        rnd = random.Random(count)
+        for _ in range(count):
+            game.bullets.add(Bullet(rnd.uniform(0, GAME_SIZE.width),
+                                    rnd.uniform(400, GAME_SIZE.height)))
+        return game
+
+    def with_bonuses(count):
+        game = create_game()
+        rnd = random.Random(count)
+        for _ in range(count):
+            bonus_cls = rnd.choice(BONUSES)
+            game.bonuses.add(bonus_cls(rnd.uniform(0, GAME_SIZE.width),
+                                       rnd.uniform(0, 300)))
+        return game
+
+    for count in counts:
+        def run_bullets(count=count, ticks=10):
+            return rate_with_setup(ticks, lambda: with_bullets(count),
+                                   lambda game: play(game, ticks))
+
+        def run_bonuses(count=count, ticks=10):
+            return rate_with_setup(ticks, lambda: with_bonuses(count),
+                                   lambda game: play(game, ticks))
+
+        benchmark('tick.bullets%s' % count)(run_bullets)
+        benchmark('tick.bonuses%s' % count)(run_bonuses)
+
+
+def register_ball_benchmarks(counts=(10, 100, 500)):
+    def with_balls(count):
+        game = create_game()
+        rnd = random.Random(count)
+        while len(game.balls) < count:
+            ball = Ball(rnd.uniform(0, GAME_SIZE.width - 35),
+                        rnd.uniform(300, 500))
+            ball.direction = Vector.from_angle(rnd.uniform(-pi, 0))
+            game.add_ball(ball)
+        return game
+
+    for count in counts:
+        def run_balls(count=count, ticks=10):
+            return rate_with_setup(ticks, lambda: with_balls(count),
+                                   lambda game: play(game, ticks))
+
+        benchmark('tick.balls%s' % count)(run_balls)
+
+
+@benchmark('frame.intersects_with')
+def run_intersects(operations=100000):
+    frame = Frame(0, 0, 35, 35)
+    other = Frame(20, 20, 100, 20)
+    intersects_with = frame.intersects_with
+    return rate(operations,
+                lambda: [intersects_with(other) for _ in range(operations)])
+
+
+@benchmark('entity.move')
+def run_move(operations=100000):
+    ball = Ball(0, 0)
+    ball.change_state(BallState.Free)
+    move = ball.move
+    return rate(operations, lambda: [move() for _ in range(operations)])
+
+
+@benchmark('game.snapshot')
+def run_snapshot(operations=10000):
+    game = create_game()
+    play(game, 500)
+    snapshot = game.snapshot
+    return rate(operations, lambda: [snapshot() for _ in range(operations)])
+
+
+@benchmark('game.restore')
+def run_restore(operations=10000):
+    game = create_game()
+    play(game, 500)
+    snapshot = game.snapshot()
+    play(game, 100)
+    restore = game.restore
+    return rate(operations,
+                lambda: [restore(snapshot) for _ in range(operations)])
+
+
+@benchmark('level.generate')
+def run_generate(operations=10):
+    return rate(operations, lambda: [
+        generate_layout(seed, 100, 200, 0.6) for seed in range(operations)])
+
+
+@benchmark('tick.generated')
+def run_generated(ticks=1000):
+    levels = LevelGenerator(seed=0, density=0.6)
+
+    def setup():
+        game = GameModel(STRESS_SIZE, seed=0, levels=levels)
+        game.release_ball()
+        return game
+
+    return rate_with_setup(ticks, setup, lambda game: play(game, ticks))
+
+
+@benchmark('render.raster')
+def run_raster(frames=2000):
+    try:
+        from raster import Rasterizer
+    except ImportError:
+        return None
+
+    game = create_game()
+    play(game, 200)
+    rasterizer = Rasterizer(GAME_SIZE, 160, 100)
+    out = rasterizer.render(game)
+
+    def render():
+        for _ in range(frames):
+            game.tick()
+            rasterizer.render(game, out)
+
+    return rate(frames, render)
+
+
+@benchmark('render.game_elements')
+def run_render(frames=200):
+    try:
+        from PyQt5.QtCore import QSize
+        from PyQt5.QtGui import QImage, QPainter
+        from PyQt5.QtWidgets import QApplication
+        from sprites import SpriteAtlas, BrickLayer
+    except ImportError:
+        return None
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    app = QApplication.instance() or QApplication(sys.argv)
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    game = create_game()
+    image = QImage(GAME_SIZE.width, GAME_SIZE.height,
+                   QImage.Format_ARGB32_Premultiplied)
+    sprites = SpriteAtlas()
+    brick_layer = BrickLayer(sprites)
+    size = QSize(*GAME_SIZE)
+
+    def render():
+        painter = QPainter(image)
+        for _ in range(frames):
+            game.tick()
+            brick_layer.update(game.level, size)
+            brick_layer.draw(painter, image.rect())
+            sprites.draw(painter, game.get_moving_entities())
+        painter.end()
+
+    result = rate(frames, render)
+    app.processEvents()
+    return result
+
+
+@benchmark('render.scene')
+def run_scene(frames=200):
+    try:
+        from PyQt5.QtCore import QSize
+        from PyQt5.QtWidgets import QApplication
+        from renderers import SceneRenderer
+        from sprites import SpriteAtlas
+    except ImportError:
+        return None
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    app = QApplication.instance() or QApplication(sys.argv)
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    game = create_game()
+    renderer = SceneRenderer(SpriteAtlas())
+    renderer.widget.resize(*GAME_SIZE)
+    renderer.widget.show()
+    size = QSize(*GAME_SIZE)
+
+    def render():
+        for _ in range(frames):
+            game.tick()
+            renderer.update(game, size, lambda entity: entity.location)
+            app.processEvents()
+
+    result = rate(frames, render)
+    renderer.widget.close()
+    return result
+
+
+def run(names=None):
+    results = {}
+    for name, function in BENCHMARKS.items():
+        if names and not any(name.startswith(prefix) for prefix in names):
+            continue
+        ops_per_sec = function()
+        if ops_per_sec is None:
+            print('%-28s skipped' % name)
+            continue
+        results[name] = ops_per_sec
+        print('%-28s %14.1f ops/s' % (name, ops_per_sec))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, ops_per_sec in sorted(results.items()):
+        if name not in baseline:
+            continue
+        ratio = ops_per_sec / baseline[name]
+        marker = ''
+        if ratio < 1 - tolerance:
+            marker = '  REGRESSION'
+            regressions.append(name)
+        print('%-28s %7.2fx%s' % (name, ratio, marker))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Arkanoid benchmarks')
+    parser.add_argument('names', nargs='*',
+                        help='run only benchmarks with these prefixes')
+    parser.add_argument('--output', help='write results to a JSON file')
+    parser.add_argument('--compare', help='baseline JSON file to compare to')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='allowed slowdown before failing (default 0.1)')
+    args = parser.parse_args(argv)
+
+    results = run(args.names)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'python': platform.python_version(),
+                       'machine': platform.machine(),
+                       'tick_duration': settings.TICK_DURATION,
+                       'results': results}, file, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)['results']
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+register_level_benchmarks()
+register_scaling_benchmarks()
+register_ball_benchmarks()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core
+from core import Size, BallState
+from game import GameModel
+
+TICKS = 2000
+
+
+def create_game():
+    game = GameModel(Size(1280, 800))
+    game.release_ball()
+    return game
+
+
+def play(game, ticks=TICKS):
+    for _ in range(ticks):
+        target = game.ball.x + (game.ball.width - game.ship.width) / 2
+        game.tick(1 if game.ship.x < target else -1)
+        if game.ball.state == BallState.Caught:
+            game.release_ball()
+
+
+def measure_time(ticks=TICKS, repeat=5):
+    return min(timeit.repeat(lambda: play(create_game(), ticks),
+                             number=1, repeat=repeat)) / ticks
+
+
+def measure_allocations(ticks=TICKS):
+    counts = {}
+    originals = {}
+
+    def counting(cls, init):
+        def __init__(self, *args, **kwargs):
+            counts[cls.__name__] += 1
+            init(self, *args, **kwargs)
+        return __init__
+
+    game = create_game()
+    for cls in (core.Frame, core.Vector, core.Location):
+        counts[cls.__name__] = 0
+        originals[cls] = cls.__init__
+        cls.__init__ = counting(cls, cls.__init__)
+    try:
+        play(game, ticks)
+    finally:
+        for cls, init in originals.items():
+            cls.__init__ = init
+    return {name: count / ticks for name, count in counts.items()}
+
+
+if __name__ == '__main__':
+    print('time per tick: %.2f us' % (measure_time() * 1e6))
+    for name, count in sorted(measure_allocations().items()):
+        print('%s allocations per tick: %.2f' % (name, count))
@@ -1,10 +1,13 @@
 import random
+from math import pi
 import settings
-from entities import MovingEntity
-from core import BallState
+from entities import MovingEntity, Ball
+from core import BallState, Vector
 
 
 class Bonus(MovingEntity):
+    duration = None
+
     def __init__(self, x, y):
         super().__init__(x, y, settings.BONUS_SIZE, settings.BONUS_VELOCITY,
                          settings.BONUS_DIRECTION)
@@ -13,24 +16,40 @@ class Bonus(MovingEntity):
         pass
 
     @staticmethod
-    def get_random_bonus():
-        return BONUSES[random.randint(0, len(BONUSES) - 1)]
+    def revert(game, payload):
+        pass
+
+    @staticmethod
+    def get_random_bonus(rng=random):
+        return BONUSES[rng.randint(0, len(BONUSES) - 1)]
 
 
 class DecreaseBonus(Bonus):
+    duration = settings.BONUS_DURATION
+
     def __init__(self, x, y):
         super().__init__(x, y)
 
     def activate(self, game):
-        game.ship.narrow()
+        game.schedule_effect(DecreaseBonus, game.ship.narrow())
+
+    @staticmethod
+    def revert(game, delta):
+        game.ship.transform(-delta[0], 0, -delta[1], 0)
 
 
 class ExpandBonus(Bonus):
+    duration = settings.BONUS_DURATION
+
     def __init__(self, x, y):
         super().__init__(x, y)
 
     def activate(self, game):
-        game.ship.expand()
+        game.schedule_effect(ExpandBonus, game.ship.expand())
+
+    @staticmethod
+    def revert(game, delta):
+        game.ship.transform(-delta[0], 0, -delta[1], 0)
 
 
 class BulletBonus(Bonus):
@@ -42,19 +61,42 @@ class BulletBonus(Bonus):
 
 
 class FireBallBonus(Bonus):
+    duration = settings.BONUS_DURATION
+
     def __init__(self, x, y):
         super().__init__(x, y)
 
     def activate(self, game):
-        game.ball.change_state(BallState.Fiery)
+        for ball in game.balls:
+            ball.change_state(BallState.Fiery)
+        game.schedule_effect(FireBallBonus)
+
+    @staticmethod
+    def revert(game, payload):
+        if game.effects.is_active(FireBallBonus):
+            return
+        for ball in game.balls:
+            if ball.state == BallState.Fiery:
+                ball.change_state(BallState.Free)
 
 
 class FastBallBonus(Bonus):
+    duration = settings.BONUS_DURATION
+
     def __init__(self, x, y):
         super().__init__(x, y)
 
     def activate(self, game):
-        game.ball.accelerate()
+        for ball in game.balls:
+            ball.accelerate()
+        game.schedule_effect(FastBallBonus)
+
+    @staticmethod
+    def revert(game, payload):
+        if game.effects.is_active(FastBallBonus):
+            return
+        for ball in game.balls:
+            ball.velocity = settings.BALL_VELOCITY
 
 
 class LifeBonus(Bonus):
@@ -73,5 +115,20 @@ class DeathBonus(Bonus):
         game.kill_player()
 
 
+class MultiBallBonus(Bonus):
+    def __init__(self, x, y):
+        super().__init__(x, y)
+
+    def activate(self, game):
+        for ball in list(game.balls):
+            for turn in (-pi / 6, pi / 6):
+                clone = Ball(ball.x, ball.y)
+                clone.direction = Vector.from_angle(
+                    ball.direction.angle + turn)
+                clone.velocity = ball.velocity
+                clone.change_state(ball.state)
+                game.add_ball(clone)
+
+
 BONUSES = [DecreaseBonus, ExpandBonus, BulletBonus, FireBallBonus,
-           FastBallBonus, LifeBonus, DeathBonus]
+           FastBallBonus, LifeBonus, DeathBonus, MultiBallBonus]
@@ -7,6 +7,8 @@ Size = namedtuple('Size', ['width', 'height'])
 
 
 class Location:
+    __slots__ = ('x', 'y')
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -23,6 +25,8 @@ class Location:
 
 
 class Frame:
+    __slots__ = ('x', 'y', 'width', 'height')
+
     def __init__(self, x, y, width, height):
         self.x = x
         self.y = y
@@ -62,8 +66,11 @@ class Frame:
         self.x, self.y = location
 
     def intersects_with(self, frame):
-        return min(self.right, frame.right) >= max(self.left, frame.left) and\
-            min(self.bottom, frame.bottom) >= max(self.top, frame.top)
+        x, y = self.x, self.y
+        other_x, other_y = frame.x, frame.y
+        return min(x + self.width, other_x + frame.width) >= \
+            max(x, other_x) and \
+            min(y + self.height, other_y + frame.height) >= max(y, other_y)
 
     def resize(self, d_width, d_height):
         return Frame(self.x, self.y,
@@ -76,12 +83,34 @@ class Frame:
     def transform(self, delta_x, delta_y, d_width, d_height):
         return self.relocate(delta_x, delta_y).resize(d_width, d_height)
 
+    def translate(self, delta_x, delta_y):
+        self.x += delta_x
+        self.y += delta_y
+
+    def grow(self, d_width, d_height):
+        self.width += d_width
+        self.height += d_height
+
+    def sweep(self, delta_x, delta_y, frame):
+        entry_x, exit_x = _sweep_axis(self.left, self.right,
+                                      frame.left, frame.right, delta_x)
+        entry_y, exit_y = _sweep_axis(self.top, self.bottom,
+                                      frame.top, frame.bottom, delta_y)
+        entry = max(entry_x, entry_y)
+        if entry > min(exit_x, exit_y) or not 0 <= entry <= 1:
+            return None
+        if entry_x > entry_y:
+            return entry, -sign(delta_x), 0
+        return entry, 0, -sign(delta_y)
+
     def __str__(self):
         return '(%s, %s), width: %s, height: %s' % (self.x, self.y, self.width,
                                                     self.height)
 
 
 class Vector:
+    __slots__ = ('x', 'y')
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -96,6 +125,9 @@ class Vector:
 
     def normalize(self):
         length = math.sqrt(self.x * self.x + self.y * self.y)
+        if length == 0:
+            self.x, self.y = 1, 0
+            return
         self.x /= length
         self.y /= length
 
@@ -121,3 +153,103 @@ def sign(number):
     if number == 0:
         return number
     return int(math.copysign(1, number))
+
+
+def _sweep_axis(start, end, other_start, other_end, delta):
+    if delta > 0:
+        return (other_start - end) / delta, (other_end - start) / delta
+    if delta < 0:
+        return (other_end - start) / delta, (other_start - end) / delta
+    if end < other_start or start > other_end:
+        return math.inf, -math.inf
+    return -math.inf, math.inf
+
+
+class SpatialGrid:
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def copy(self):
+        grid = SpatialGrid(self.cell_size)
+        grid.cells = {cell: set(entities)
+                      for cell, entities in self.cells.items()}
+        return grid
+
+    def _cell_range(self, frame):
+        width, height = self.cell_size
+        return (range(math.floor(frame.left / width),
+                      math.floor(frame.right / width) + 1),
+                range(math.floor(frame.top / height),
+                      math.floor(frame.bottom / height) + 1))
+
+    def add(self, entity):
+        columns, rows = self._cell_range(entity.frame)
+        for column in columns:
+            for row in rows:
+                self.cells.setdefault((column, row), set()).add(entity)
+
+    def remove(self, entity):
+        columns, rows = self._cell_range(entity.frame)
+        for column in columns:
+            for row in rows:
+                cell = self.cells.get((column, row))
+                if cell is None:
+                    continue
+                cell.discard(entity)
+                if not cell:
+                    del self.cells[(column, row)]
+
+    def count_area(self, left, top, right, bottom):
+        width, height = self.cell_size
+        cells = self.cells
+        count = 0
+        for column in range(math.floor(left / width),
+                            math.floor(right / width) + 1):
+            for row in range(math.floor(top / height),
+                             math.floor(bottom / height) + 1):
+                cell = cells.get((column, row))
+                if cell is not None:
+                    count += len(cell)
+        return count
+
+    def query(self, frame):
+        columns, rows = self._cell_range(frame)
+        found = set()
+        for column in columns:
+            for row in rows:
+                cell = self.cells.get((column, row))
+                if cell is None:
+                    continue
+                for entity in cell:
+                    if entity.frame.intersects_with(frame):
+                        found.add(entity)
+        return found
+
+    def query_all(self, x, y, width, height, count):
+        cell_width, cell_height = self.cell_size
+        cells = self.cells
+        floor = math.floor
+        for index in range(count):
+            left, top = x[index], y[index]
+            right, bottom = left + width[index], top + height[index]
+            rows = range(floor(top / cell_height),
+                         floor(bottom / cell_height) + 1)
+            found = None
+            for column in range(floor(left / cell_width),
+                                floor(right / cell_width) + 1):
+                for row in rows:
+                    cell = cells.get((column, row))
+                    if cell is None:
+                        continue
+                    for entity in cell:
+                        frame = entity.frame
+                        if right >= frame.x and \
+                                frame.x + frame.width >= left and \
+                                bottom >= frame.y and \
+                                frame.y + frame.height >= top:
+                            if found is None:
+                                found = set()
+                            found.add(entity)
+            if found:
+                yield index, found
@@ -0,0 +1,40 @@
+import heapq
+
+
+class EffectScheduler:
+    def __init__(self):
+        self.heap = []
+        self.active = {}
+        self.sequence = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def is_active(self, key):
+        return self.active.get(key, 0) > 0
+
+    def schedule(self, expires, key, payload=None):
+        heapq.heappush(self.heap, (expires, self.sequence, key, payload))
+        self.sequence += 1
+        self.active[key] = self.active.get(key, 0) + 1
+
+    def expire(self, now):
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            _, _, key, payload = heapq.heappop(heap)
+            self.active[key] -= 1
+            yield key, payload
+
+    def clear(self):
+        self.heap.clear()
+        self.active.clear()
+
+    def snapshot(self):
+        return tuple(self.heap), self.sequence
+
+    def restore(self, state):
+        heap, self.sequence = state
+        self.heap = list(heap)
+        self.active = {}
+        for _, _, key, _ in heap:
+            self.active[key] = self.active.get(key, 0) + 1
@@ -1,6 +1,6 @@
-import math
 import os.path
 import settings
+from balls import BallArray, BallDirection, BallFrame, STATES
 from core import Frame, BallState, Vector
 
 
@@ -26,11 +26,12 @@ class Entity:
 
     @property
     def top(self):
-        return self.frame.top
+        return self.frame.y
 
     @property
     def bottom(self):
-        return self.frame.bottom
+        frame = self.frame
+        return frame.y + frame.height
 
     @property
     def middle(self):
@@ -38,11 +39,12 @@ class Entity:
 
     @property
     def left(self):
-        return self.frame.left
+        return self.frame.x
 
     @property
     def right(self):
-        return self.frame.right
+        frame = self.frame
+        return frame.x + frame.width
 
     @property
     def center(self):
@@ -60,13 +62,14 @@ class Entity:
         return self.frame.intersects_with(other.frame)
 
     def resize(self, d_width, d_height):
-        self.frame = self.frame.resize(d_width, d_height)
+        self.frame.grow(d_width, d_height)
 
     def relocate(self, delta_x, delta_y):
-        self.frame = self.frame.relocate(delta_x, delta_y)
+        self.frame.translate(delta_x, delta_y)
 
     def transform(self, delta_x, delta_y, d_width, d_height):
-        return self.relocate(delta_x, delta_y).resize(d_width, d_height)
+        self.frame.translate(delta_x, delta_y)
+        self.frame.grow(d_width, d_height)
 
     def get_image(self):
         return os.path.join('images', '%s.png' % type(self).__name__.lower())
@@ -77,12 +80,12 @@ class MovingEntity(Entity):
         super().__init__(x, y, size)
         self.velocity = velocity
         self.direction = Vector(*direction)
+        self.direction.normalize()
 
     def move(self, turn_rate=1):
-        dir_angle = self.direction.angle
-        delta_x = math.cos(dir_angle) * self.velocity * turn_rate
-        delta_y = math.sin(dir_angle) * self.velocity * turn_rate
-        self.frame = self.frame.relocate(delta_x, delta_y)
+        distance = self.velocity * turn_rate
+        direction = self.direction
+        self.frame.translate(direction.x * distance, direction.y * distance)
 
 
 class Ship(MovingEntity):
@@ -92,12 +95,16 @@ class Ship(MovingEntity):
         self.bullets = 0
 
     def expand(self):
-        self.frame = self.frame.transform(-self.frame.width / 2, 0,
-                                          int(self.frame.width / 2), 0)
+        width = self.frame.width
+        delta = (-width / 2, int(width / 2))
+        self.transform(delta[0], 0, delta[1], 0)
+        return delta
 
     def narrow(self):
-        self.frame = self.frame.transform(self.frame.width / 2, 0,
-                                          -int(self.frame.width / 2), 0)
+        width = self.frame.width
+        delta = (width / 2, -int(width / 2))
+        self.transform(delta[0], 0, delta[1], 0)
+        return delta
 
     def get_ammo(self, count):
         self.bullets += count
@@ -111,22 +118,57 @@ class Ship(MovingEntity):
 
 class Ball(MovingEntity):
     def __init__(self, x=0, y=0):
-        super().__init__(x, y, settings.BALL_SIZE, settings.BALL_VELOCITY,
-                         settings.BALL_DIRECTION)
+        self.store = self.index = None
+        self.frame = BallFrame(None, None)
+        self._direction = BallDirection(None, None)
+        BallArray(1).add(self)
+        self.frame.location = (x, y)
+        self.frame.width, self.frame.height = settings.BALL_SIZE
+        self.velocity = settings.BALL_VELOCITY
+        self.direction = Vector(*settings.BALL_DIRECTION)
+        self.direction.normalize()
         self.state = BallState.Free
         self.was_reflected = False
 
+    def bind(self, store, index):
+        self.store = self.frame.store = self._direction.store = store
+        self.index = self.frame.index = self._direction.index = index
+
+    @property
+    def direction(self):
+        return self._direction
+
+    @direction.setter
+    def direction(self, direction):
+        self._direction.x, self._direction.y = direction.x, direction.y
+
+    @property
+    def velocity(self):
+        return self.store.velocity[self.index]
+
+    @velocity.setter
+    def velocity(self, velocity):
+        self.store.velocity[self.index] = velocity
+
+    @property
+    def state(self):
+        return STATES[self.store.state[self.index]]
+
+    @state.setter
+    def state(self, state):
+        self.store.state[self.index] = state.value
+
     def stick_to_ship(self):
         self.change_state(BallState.Caught)
 
     def change_state(self, state):
         self.state = state
 
-    def move(self, delta_x=None):
+    def move(self, delta_x=None, turn_rate=1):
         if self.state != BallState.Caught:
-            super().move()
+            super().move(turn_rate)
         else:
-            self.frame = self.frame.relocate(delta_x, 0)
+            self.frame.translate(delta_x, 0)
 
     def accelerate(self):
         self.velocity = 1.5 * settings.BALL_VELOCITY
@@ -0,0 +1,158 @@
+import multiprocessing
+import os
+import random
+from core import Size, BallState
+from game import GameModel
+
+ACTIONS = ((0, False), (-1, False), (1, False), (0, True))
+OBSERVATION_SIZE = 10
+LIFE_PENALTY = 100
+
+
+def get_observation(game):
+    width, height = game.size
+    ship = game.ship
+    ball = game.ball
+    return (ship.x / width, ship.width / width,
+            ball.x / width, ball.y / height,
+            ball.direction.x, ball.direction.y,
+            float(ball.state == BallState.Caught),
+            float(game.player.lives), float(game.player.score),
+            float(len(game.level.blocks)))
+
+
+class ArkanoidEnv:
+    def __init__(self, size=Size(1000, 800), seed=None, max_ticks=None,
+                 frame_skip=1, swept=False):
+        self.size = size
+        self.random = random.Random(seed)
+        self.max_ticks = max_ticks
+        self.frame_skip = frame_skip
+        self.swept = swept
+        self.game = None
+        self.ticks = 0
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.random.seed(seed)
+        self.game = GameModel(self.size, self.swept,
+                              self.random.randrange(2 ** 63))
+        self.ticks = 0
+        return get_observation(self.game)
+
+    def step(self, action):
+        game = self.game
+        turn_rate, fire = ACTIONS[action]
+        score = game.player.score
+        lives = game.player.lives
+        if fire and not game.release_ball():
+            game.shooting()
+        for _ in range(self.frame_skip):
+            game.tick(turn_rate)
+        self.ticks += self.frame_skip
+
+        reward = game.player.score - score - \
+            LIFE_PENALTY * max(0, lives - game.player.lives)
+        truncated = self.max_ticks is not None and \
+            self.ticks >= self.max_ticks
+        done = game.gameover or game.won or truncated
+        info = {'score': game.player.score, 'lives': game.player.lives,
+                'ticks': self.ticks, 'truncated': truncated}
+        return get_observation(game), reward, done, info
+
+
+def step_all(envs, actions):
+    results = []
+    for env, action in zip(envs, actions):
+        observation, reward, done, info = env.step(action)
+        if done:
+            info['final_observation'] = observation
+            observation = env.reset()
+        results.append((observation, reward, done, info))
+    return results
+
+
+def _worker(connection, seeds, options):
+    envs = [ArkanoidEnv(seed=seed, **options) for seed in seeds]
+    try:
+        while True:
+            command, data = connection.recv()
+            if command == 'step':
+                connection.send(step_all(envs, data))
+            elif command == 'reset':
+                connection.send([env.reset() for env in envs])
+            elif command == 'close':
+                break
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        connection.close()
+
+
+class VectorEnv:
+    def __init__(self, count, seed=0, workers=None, **options):
+        if workers is None:
+            workers = min(count, os.cpu_count() or 1)
+        self.count = count
+        self.envs = []
+        self.shards = []
+        self.connections = []
+        self.processes = []
+        if workers == 0:
+            self.envs = [ArkanoidEnv(seed=seed + i, **options)
+                         for i in range(count)]
+            return
+
+        self.shards = [range(count * i // workers, count * (i + 1) // workers)
+                       for i in range(workers)]
+        context = multiprocessing.get_context()
+        for shard in self.shards:
+            parent, child = context.Pipe()
+            process = context.Process(
+                target=_worker,
+                args=(child, [seed + i for i in shard], options),
+                daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+    def __len__(self):
+        return self.count
+
+    def reset(self):
+        if self.envs:
+            return [env.reset() for env in self.envs]
+        for connection in self.connections:
+            connection.send(('reset', None))
+        return [observation for connection in self.connections
+                for observation in connection.recv()]
+
+    def step(self, actions):
+        if self.envs:
+            results = step_all(self.envs, actions)
+        else:
+            for connection, shard in zip(self.connections, self.shards):
+                connection.send(('step', [actions[i] for i in shard]))
+            results = [result for connection in self.connections
+                       for result in connection.recv()]
+        observations, rewards, dones, infos = zip(*results)
+        return list(observations), list(rewards), list(dones), list(infos)
+
+    def close(self):
+        for connection in self.connections:
+            try:
+                connection.send(('close', None))
+            except (BrokenPipeError, EOFError):
+                pass
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,50 @@
+from array import array
+
+BRICK = 1
+PADDLE = 2
+BONUS = 3
+DEATH = 4
+
+EVENT_QUEUE_SIZE = 256
+
+
+class RingBuffer:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.head = 0
+        self.tail = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return (self.tail - self.head) % self.capacity
+
+    def drain(self):
+        head, tail = self.head, self.tail
+        if head <= tail:
+            drained = self.read(head, tail)
+        else:
+            drained = self.read(head, self.capacity) + self.read(0, tail)
+        self.head = tail
+        return drained
+
+    def read(self, start, end):
+        raise NotImplementedError
+
+
+class EventQueue(RingBuffer):
+    def __init__(self, capacity=EVENT_QUEUE_SIZE):
+        super().__init__(capacity)
+        self.events = array('B', [0]) * capacity
+
+    def emit(self, event):
+        tail = self.tail + 1
+        if tail == self.capacity:
+            tail = 0
+        if tail == self.head:
+            self.dropped += 1
+            return
+        self.events[self.tail] = event
+        self.tail = tail
+
+    def read(self, start, end):
+        return self.events[start:end]
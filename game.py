@@ -1,10 +1,34 @@
 ﻿import random
+from collections import namedtuple
 from math import pi, cos
+import events
 import settings
-from bonuses import Bonus
-from entities import Ship, Ball, Bullet
+import telemetry
+from balls import BallArray
+from bonuses import Bonus, BONUSES
+from entities import Ship, Ball, Bullet, Brick
 from core import Frame, BallState, Vector
-from level import LevelCreator
+from effects import EffectScheduler
+from level import LEVELS
+from pool import EntityPool, ActiveList
+from profiler import TickProfiler
+
+MAX_BALL_CONTACTS = 8
+
+Snapshot = namedtuple('Snapshot', ['score', 'lives', 'current_level', 'won',
+                                   'random', 'ship', 'balls', 'bullets',
+                                   'bonuses', 'level', 'blocks', 'ticks',
+                                   'effects'])
+
+
+def block_order(block):
+    return block.y, block.x
+
+
+def first_block(blocks):
+    if len(blocks) == 1:
+        return next(iter(blocks))
+    return min(blocks, key=block_order)
 
 
 class Player:
@@ -23,23 +47,38 @@ class Player:
 
 
 class GameModel:
-    def __init__(self, size):
+    def __init__(self, size, swept=False, seed=None, levels=LEVELS):
         self.size = size
+        self.swept = swept
+        if seed is None:
+            seed = random.randrange(2 ** 63)
+        self.seed = seed
+        self.random = random.Random(seed)
         self.frame = Frame(0, 0, *size)
 
         self.player = Player()
         self.current_level = 1
 
         self.won = False
+        self.ship_delta = 0
+        self.hits = []
+        self.profiler = None
+        self.telemetry = None
+        self.telemetry_writer = None
+        self.events = events.EventQueue()
+        self.ticks = 0
+        self.effects = EffectScheduler()
+        self.balls = BallArray(settings.MAX_BALLS)
+        self.bullets = ActiveList(settings.MAX_BULLETS)
+        self.bonuses = ActiveList(settings.MAX_BONUSES)
+        self.bullet_pool = EntityPool(Bullet)
+        self.bonus_pools = {}
         self.reset()
         self.deadly_height = self.ship.bottom - \
             self.ship.frame.height / 2
 
-        self.levels = LevelCreator.get_levels(size)
-        self.level = self.levels[self.current_level]
-
-        self.bonuses = set()
-        self.bullets = set()
+        self.levels = levels
+        self.level = levels.get_level(self.current_level, size)
 
     @property
     def gameover(self):
@@ -49,9 +88,22 @@ class GameModel:
     def level_completed(self):
         return len(self.level.blocks) == 0
 
+    @property
+    def ball(self):
+        return self.balls[0]
+
+    @ball.setter
+    def ball(self, ball):
+        self.balls.clear()
+        self.balls.add(ball)
+
+    def add_ball(self, ball):
+        return self.balls.add(ball)
+
     def get_entities(self):
         yield self.ship
-        yield self.ball
+        for ball in self.balls:
+            yield ball
         for block in self.level.blocks:
             yield block
         for bullet in self.bullets:
@@ -59,67 +111,290 @@ class GameModel:
         for bonus in self.bonuses:
             yield bonus
 
+    def get_moving_entities(self):
+        yield self.ship
+        for ball in self.balls:
+            yield ball
+        for bullet in self.bullets:
+            yield bullet
+        for bonus in self.bonuses:
+            yield bonus
+
     def release_ball(self):
-        if self.ball.state == BallState.Caught:
-            self.ball.change_state(BallState.Free)
-            return True
-        return False
+        released = False
+        for ball in self.balls:
+            if ball.state == BallState.Caught:
+                ball.change_state(BallState.Free)
+                released = True
+        return released
+
+    def move_ship_to(self, x):
+        old_x = self.ship.x
+        self.ship.location = (x, self.ship.y)
+        for ball in self.balls:
+            if ball.state == BallState.Caught:
+                ball.move(self.ship.x - old_x)
 
     def shooting(self):
         if self.ship.try_shoot():
-            bullet1 = Bullet(self.ship.left, self.ship.top)
-            bullet2 = Bullet(self.ship.right, self.ship.top)
-            self.bullets.add(bullet1)
-            self.bullets.add(bullet2)
+            for x in (self.ship.left, self.ship.right):
+                bullet = self.bullet_pool.acquire(x, self.ship.top)
+                if not self.bullets.add(bullet):
+                    self.bullet_pool.release(bullet)
 
-    def tick(self, turn_rate=0):
+    def tick(self, turn_rate=0, time_step=1):
         if self.gameover or self.won:
             return
+        if self.profiler is not None:
+            self.profiler.profile_tick(self, turn_rate, time_step)
+            return
+
+        self.update_effects(time_step)
+        ship_delta = self.move_ship(turn_rate, time_step)
+        self.move_balls(ship_delta, time_step)
+        self.check_progress()
+
+        for ball, blocks_to_remove in self.find_smashed_blocks():
+            self.smash_blocks(blocks_to_remove, ball)
+
+        self.remove_bonuses(time_step)
+        self.remove_bullets(time_step)
+        self.try_reflect_from_ship()
+
+    def tick_effects(self, turn_rate, time_step):
+        self.update_effects(time_step)
+
+    def tick_ship(self, turn_rate, time_step):
+        self.ship_delta = self.move_ship(turn_rate, time_step)
 
+    def tick_balls(self, turn_rate, time_step):
+        self.move_balls(self.ship_delta, time_step)
+
+    def tick_progress(self, turn_rate, time_step):
+        self.check_progress()
+
+    def tick_collision(self, turn_rate, time_step):
+        self.hits = self.find_smashed_blocks()
+
+    def tick_smash(self, turn_rate, time_step):
+        for ball, blocks_to_remove in self.hits:
+            self.smash_blocks(blocks_to_remove, ball)
+
+    def tick_bonuses(self, turn_rate, time_step):
+        self.remove_bonuses(time_step)
+
+    def tick_bullets(self, turn_rate, time_step):
+        self.remove_bullets(time_step)
+
+    def tick_paddle(self, turn_rate, time_step):
+        self.try_reflect_from_ship()
+
+    def enable_profiling(self, capacity=1024):
+        self.profiler = TickProfiler(TICK_PHASES, capacity)
+        return self.profiler
+
+    def disable_profiling(self):
+        self.profiler = None
+
+    def enable_telemetry(self, path, capacity=telemetry.TELEMETRY_CAPACITY):
+        self.disable_telemetry()
+        self.telemetry = telemetry.TelemetryBuffer(capacity)
+        self.telemetry_writer = telemetry.TelemetryWriter(self.telemetry, path)
+        self.telemetry_writer.start()
+        return self.telemetry
+
+    def disable_telemetry(self):
+        if self.telemetry_writer is not None:
+            self.telemetry_writer.stop()
+        self.telemetry = None
+        self.telemetry_writer = None
+
+    def emit_telemetry(self, kind, value=0):
+        if self.telemetry is not None:
+            self.telemetry.emit(self.ticks, kind, value)
+
+    def move_ship(self, turn_rate, time_step=1):
         old_x = self.ship.left
-        self.ship.move(turn_rate)
+        self.ship.move(turn_rate * time_step)
         self.normalize_ship_location()
-        self.ball.move(self.ship.left - old_x)
-        self.try_reflect_ball()
+        return self.ship.left - old_x
+
+    def move_balls(self, ship_delta, time_step=1):
+        balls = self.balls
+        if self.swept:
+            for ball in balls:
+                if ball.state != BallState.Caught:
+                    self.sweep_ball(ball, time_step)
+                else:
+                    ball.move(ship_delta, time_step)
+                    self.try_reflect_ball(ball)
+            return
 
-        if self.ball.middle > self.deadly_height:
+        x, y, width = balls.x, balls.y, balls.width
+        dx, dy, velocity, state = balls.dx, balls.dy, balls.velocity, \
+            balls.state
+        left, right = self.frame.left, self.frame.right
+        top = self.frame.top + 0.1
+        caught = BallState.Caught.value
+        for index in range(balls.count):
+            if state[index] == caught:
+                x[index] += ship_delta
+            else:
+                distance = velocity[index] * time_step
+                x[index] += dx[index] * distance
+                y[index] += dy[index] * distance
+            direction_x = dx[index]
+            if direction_x > 0 and x[index] + width[index] > right or \
+                    direction_x < 0 and x[index] < left:
+                dx[index] = -direction_x
+            if dy[index] < 0 and y[index] < top:
+                dy[index] = -dy[index]
+
+    def check_progress(self):
+        balls = self.balls
+        y, height = balls.y, balls.height
+        deadly_height = self.deadly_height
+        lost = [index for index in range(balls.count)
+                if y[index] + height[index] - int(height[index] / 2) >
+                deadly_height]
+        if len(lost) == balls.count:
             self.kill_player()
+        elif lost:
+            balls.remove(lost)
 
         if self.level_completed:
             self.player.score += 1000 * self.current_level
             if not self.try_get_next_level():
                 self.won = True
 
-        blocks_to_remove = {block for block in self.level.blocks
-                            if block.intersects_with(self.ball)}
-        if len(blocks_to_remove) != 0:
-            self.smash_blocks(blocks_to_remove)
-
-        self.remove_bonuses()
-        self.remove_bullets()
-
-        if self.ball.intersects_with(self.ship):
-            mid = self.ship.right - self.ship.width / 2
-            ball_mid = self.ball.right - self.ball.width / 2
-            self.ball.direction = Vector.from_angle(
-                -pi / 2 + (pi / 2.75 * (ball_mid - mid) /
-                           (self.ship.width / 2)))
+    def find_smashed_blocks(self):
+        if self.swept:
+            return []
+        hits = []
+        claimed = set()
+        balls = self.balls
+        for index, blocks_to_remove in self.level.grid.query_all(
+                balls.x, balls.y, balls.width, balls.height, balls.count):
+            ball = balls.items[index]
+            if claimed:
+                blocks_to_remove -= claimed
+            if len(blocks_to_remove) != 0:
+                hits.append((ball, blocks_to_remove))
+                claimed |= blocks_to_remove
+        return hits
+
+    def try_reflect_from_ship(self):
+        balls = self.balls
+        x, y, width, height = balls.x, balls.y, balls.width, balls.height
+        ship = self.ship.frame
+        left, top = ship.x, ship.y
+        right, bottom = left + ship.width, top + ship.height
+        for index in range(balls.count):
+            ball_x, ball_y = x[index], y[index]
+            if ball_x <= right and ball_x + width[index] >= left and \
+                    ball_y <= bottom and ball_y + height[index] >= top:
+                self.reflect_from_ship(balls.items[index])
+
+    def reflect_from_ship(self, ball):
+        if ball.direction.y > 0 and ball.state != BallState.Caught:
+            self.events.emit(events.PADDLE)
+        mid = self.ship.right - self.ship.width / 2
+        ball_mid = ball.right - ball.width / 2
+        ball.direction = Vector.from_angle(
+            -pi / 2 + (pi / 2.75 * (ball_mid - mid) /
+                       (self.ship.width / 2)))
+
+    def sweep_ball(self, ball, time_step=1):
+        ball.direction.normalize()
+        remaining = time_step
+        for _ in range(MAX_BALL_CONTACTS):
+            delta_x = ball.direction.x * ball.velocity * remaining
+            delta_y = ball.direction.y * ball.velocity * remaining
+            time, obstacle, normal = self.find_ball_contact(ball, delta_x,
+                                                            delta_y)
+            ball.relocate(delta_x * time, delta_y * time)
+            remaining *= 1 - time
+            if obstacle is None:
+                break
+            self.resolve_ball_contact(ball, obstacle, normal)
+
+    def find_ball_contact(self, ball, delta_x, delta_y):
+        contact = (1, None, None)
+
+        walls = []
+        if delta_x > 0:
+            walls.append(((self.frame.right - ball.right) / delta_x, (-1, 0)))
+        elif delta_x < 0:
+            walls.append(((self.frame.left - ball.left) / delta_x, (1, 0)))
+        if delta_y < 0:
+            walls.append(((self.frame.top - ball.top) / delta_y, (0, 1)))
+        for time, normal in walls:
+            time = max(time, 0)
+            if time <= contact[0]:
+                contact = (time, self, normal)
+
+        swept_frame = Frame(min(ball.x, ball.x + delta_x),
+                            min(ball.y, ball.y + delta_y),
+                            ball.width + abs(delta_x),
+                            ball.height + abs(delta_y))
+        obstacles = sorted(self.level.grid.query(swept_frame),
+                           key=block_order)
+        if delta_y > 0:
+            obstacles.append(self.ship)
+        for obstacle in obstacles:
+            hit = ball.frame.sweep(delta_x, delta_y, obstacle.frame)
+            if hit is not None and hit[0] < contact[0]:
+                contact = (hit[0], obstacle, hit[1:])
+        return contact
+
+    def resolve_ball_contact(self, ball, obstacle, normal):
+        if obstacle is self.ship:
+            self.reflect_from_ship(ball)
+            return
+        if isinstance(obstacle, Brick):
+            self.destroy_blocks({obstacle})
+            if ball.state == BallState.Fiery:
+                return
+        direction = ball.direction
+        normal_x, normal_y = normal
+        if normal_x != 0:
+            direction.x = abs(direction.x) * normal_x
+        if normal_y != 0:
+            direction.y = abs(direction.y) * normal_y
 
     def try_get_next_level(self):
+        self.emit_telemetry(telemetry.LEVEL_COMPLETED, self.current_level)
         self.current_level += 1
-        if self.current_level < len(self.levels) + 1:
-            self.level = self.levels[self.current_level]
+        if self.current_level in self.levels:
+            self.level = self.levels.get_level(self.current_level,
+                                               self.size)
             self.reset()
             return True
         return False
 
+    def schedule_effect(self, bonus_cls, payload=None):
+        if bonus_cls.duration is not None:
+            self.effects.schedule(self.ticks + bonus_cls.duration, bonus_cls,
+                                  payload)
+
+    def update_effects(self, time_step=1):
+        self.ticks += time_step
+        if self.effects.heap and self.effects.heap[0][0] <= self.ticks:
+            for bonus_cls, payload in self.effects.expire(self.ticks):
+                bonus_cls.revert(self, payload)
+
     def kill_player(self):
+        self.events.emit(events.DEATH)
+        self.emit_telemetry(telemetry.DEATH, self.player.lives - 1)
         self.player.die()
         self.reset()
 
     def reset(self):
-        self.bonuses = set()
-        self.bullets = set()
+        self.effects.clear()
+        while self.bullets:
+            self.release_bullet(len(self.bullets) - 1)
+        while self.bonuses:
+            self.release_bonus(len(self.bonuses) - 1)
 
         self.ship = Ship((self.size.width - settings.SHIP_SIZE.width) / 2,
                          self.size.height - settings.SHIP_SIZE.height)
@@ -130,13 +405,51 @@ class GameModel:
         self.ball = Ball(ball_x, ball_y)
         self.ball.stick_to_ship()
 
+    def snapshot(self):
+        ship = self.ship.frame
+        return Snapshot(
+            self.player.score, self.player.lives, self.current_level,
+            self.won, self.random.getstate(),
+            (ship.x, ship.y, ship.width, ship.height, self.ship.bullets),
+            self.balls.snapshot(),
+            tuple((bullet.x, bullet.y) for bullet in self.bullets),
+            tuple((type(bonus), bonus.x, bonus.y) for bonus in self.bonuses),
+            self.level, self.level.snapshot(), self.ticks,
+            self.effects.snapshot())
+
+    def restore(self, snapshot):
+        self.player.score = snapshot.score
+        self.player.lives = snapshot.lives
+        self.current_level = snapshot.current_level
+        self.won = snapshot.won
+        self.random.setstate(snapshot.random)
+        self.ticks = snapshot.ticks
+        self.effects.restore(snapshot.effects)
+
+        ship = self.ship.frame
+        ship.x, ship.y, ship.width, ship.height, self.ship.bullets = \
+            snapshot.ship
+
+        self.balls.restore(snapshot.balls, Ball)
+
+        while self.bullets:
+            self.release_bullet(len(self.bullets) - 1)
+        for x, y in snapshot.bullets:
+            self.bullets.add(self.bullet_pool.acquire(x, y))
+        while self.bonuses:
+            self.release_bonus(len(self.bonuses) - 1)
+        for bonus_cls, x, y in snapshot.bonuses:
+            self.bonuses.add(self.get_bonus_pool(bonus_cls).acquire(x, y))
+
+        self.level = snapshot.level
+        self.level.restore(snapshot.blocks)
+
     def normalize_ship_location(self):
         self.ship.location = (min(max(0, self.ship.left),
                                   self.frame.right - self.ship.width),
                               self.ship.y)
 
-    def try_reflect_ball(self):
-        ball = self.ball
+    def try_reflect_ball(self, ball):
         if ball.direction.x > 0 and ball.right > self.frame.right or \
                 ball.direction.x < 0 and ball.x < self.frame.left:
             ball.direction.x = -ball.direction.x
@@ -145,16 +458,36 @@ class GameModel:
             ball.direction.y = -ball.direction.y
 
     def try_get_bonus(self, block):
-        chance = random.random()
+        chance = self.random.random()
         if chance > 0.75:
-            bonus_cls = Bonus.get_random_bonus()
-            bonus = bonus_cls(block.left, block.top)
-            self.bonuses.add(bonus)
-
-    def smash_blocks(self, blocks_to_remove):
-        block = next(iter(blocks_to_remove))
-        if self.ball.state != BallState.Fiery:
-            ball = self.ball
+            bonus_cls = Bonus.get_random_bonus(self.random)
+            pool = self.get_bonus_pool(bonus_cls)
+            bonus = pool.acquire(block.left, block.top)
+            if not self.bonuses.add(bonus):
+                pool.release(bonus)
+                return
+            self.emit_telemetry(telemetry.BONUS_SPAWNED,
+                                BONUSES.index(bonus_cls))
+
+    def get_bonus_pool(self, bonus_cls):
+        pool = self.bonus_pools.get(bonus_cls)
+        if pool is None:
+            pool = EntityPool(bonus_cls)
+            self.bonus_pools[bonus_cls] = pool
+        return pool
+
+    def release_bonus(self, index):
+        bonus = self.bonuses.remove_at(index)
+        self.get_bonus_pool(type(bonus)).release(bonus)
+        return bonus
+
+    def release_bullet(self, index):
+        self.bullet_pool.release(self.bullets.remove_at(index))
+
+    def smash_blocks(self, blocks_to_remove, ball=None):
+        ball = ball or self.ball
+        block = first_block(blocks_to_remove)
+        if ball.state != BallState.Fiery:
             delta = ball.center - block.center
             ball.direction.normalize()
 
@@ -163,32 +496,64 @@ class GameModel:
                 ball.direction.y = -ball.direction.y
             else:
                 ball.direction.x = -ball.direction.x
-        self.level.blocks -= blocks_to_remove
+        self.destroy_blocks(blocks_to_remove)
+
+    def destroy_blocks(self, blocks_to_remove):
+        block = first_block(blocks_to_remove)
+        self.level.remove_blocks(blocks_to_remove)
+        self.events.emit(events.BRICK)
+        self.emit_telemetry(telemetry.SMASH, len(blocks_to_remove))
 
         self.try_get_bonus(block)
         self.player.get_scores(len(blocks_to_remove))
 
-    def remove_bonuses(self):
-        bonuses_to_remove = {bonus for bonus in self.bonuses
-                             if not bonus.intersects_with(self)}
-        for bonus in self.bonuses:
-            bonus.move()
-            if bonus.intersects_with(self.ship):
+    def remove_bonuses(self, time_step=1):
+        bonuses = self.bonuses
+        frame, ship_frame = self.frame, self.ship.frame
+        index = len(bonuses) - 1
+        while index >= 0:
+            bonus = bonuses.items[index]
+            outside = not bonus.frame.intersects_with(frame)
+            bonus.move(time_step)
+            if bonus.frame.intersects_with(ship_frame):
+                self.release_bonus(index)
+                self.events.emit(events.BONUS)
+                self.emit_telemetry(telemetry.BONUS_CAUGHT,
+                                    BONUSES.index(type(bonus)))
                 bonus.activate(self)
-                bonuses_to_remove.add(bonus)
-
-        self.bonuses -= bonuses_to_remove
+            elif outside:
+                self.release_bonus(index)
+            index = min(index, len(bonuses)) - 1
+            ship_frame = self.ship.frame
 
-    def remove_bullets(self):
-        bullets_to_remove = {bullet for bullet in self.bullets
-                             if not bullet.intersects_with(self)}
+    def remove_bullets(self, time_step=1):
         blocks_to_remove = set()
-        for bullet in self.bullets:
-            bullet.move()
-            for block in self.level.blocks:
-                if bullet.intersects_with(block):
-                    blocks_to_remove.add(block)
-                    bullets_to_remove.add(bullet)
-
-        self.bullets -= bullets_to_remove
-        self.level.blocks -= blocks_to_remove
+        items, frame = self.bullets.items, self.frame
+        query = self.level.grid.query
+        for index in range(len(self.bullets) - 1, -1, -1):
+            bullet = items[index]
+            outside = not bullet.frame.intersects_with(frame)
+            bullet.move(time_step)
+            hit_blocks = query(bullet.frame)
+            if hit_blocks:
+                blocks_to_remove |= hit_blocks
+                self.events.emit(events.BRICK)
+            if hit_blocks or outside:
+                self.release_bullet(index)
+
+        if blocks_to_remove:
+            self.emit_telemetry(telemetry.SMASH, len(blocks_to_remove))
+        self.level.remove_blocks(blocks_to_remove)
+
+
+TICK_PHASES = (
+    ('effects', GameModel.tick_effects),
+    ('ship', GameModel.tick_ship),
+    ('ball', GameModel.tick_balls),
+    ('progress', GameModel.tick_progress),
+    ('collision', GameModel.tick_collision),
+    ('smash', GameModel.tick_smash),
+    ('bonuses', GameModel.tick_bonuses),
+    ('bullets', GameModel.tick_bullets),
+    ('paddle', GameModel.tick_paddle),
+)
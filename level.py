@@ -1,49 +1,123 @@
+import os.path
+from collections import namedtuple
 import settings
+from core import SpatialGrid
 from entities import Brick
 
+Layout = namedtuple('Layout', ['top', 'width', 'cells'])
+
 
 class Level:
     def __init__(self, lvl, blocks):
         self.lvl = lvl
         self.blocks = blocks
+        self.smashed = set()
+        self.frozen = None
+        self.grid = SpatialGrid(settings.BRICK_SIZE)
+        for block in blocks:
+            self.grid.add(block)
+
+    def copy(self):
+        level = Level.__new__(Level)
+        level.lvl = self.lvl
+        level.blocks = set(self.blocks)
+        level.smashed = set()
+        level.frozen = self.frozen
+        level.grid = self.grid.copy()
+        return level
+
+    def get_intersecting(self, entity):
+        return self.grid.query(entity.frame)
+
+    def remove_blocks(self, blocks):
+        if not blocks:
+            return
+        for block in blocks:
+            self.grid.remove(block)
+        self.smashed.update(blocks)
+        self.blocks -= blocks
+        self.frozen = None
+
+    def snapshot(self):
+        if self.frozen is None:
+            self.frozen = frozenset(self.blocks)
+        return self.frozen
+
+    def restore(self, blocks):
+        if blocks is self.frozen:
+            return
+        for block in self.blocks - blocks:
+            self.grid.remove(block)
+        restored = blocks - self.blocks
+        for block in restored:
+            self.grid.add(block)
+        self.smashed.update(restored)
+        self.blocks = set(blocks)
+        self.frozen = blocks
+
+
+class LevelRegistry:
+    def __init__(self, directory):
+        self.directory = directory
+        self.paths = {}
+        for name in os.listdir(directory):
+            number, extension = os.path.splitext(name)
+            if extension == '.txt' and number.isdigit():
+                self.paths[int(number)] = os.path.join(directory, name)
+        self.layouts = {}
+        self.levels = {}
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __contains__(self, number):
+        return number in self.paths
+
+    def get_layout(self, number):
+        layout = self.layouts.get(number)
+        if layout is None:
+            with open(self.paths[number]) as file:
+                layout = parse_layout(file.read())
+            self.layouts[number] = layout
+        return layout
+
+    def get_level(self, number, game_size):
+        key = (number, tuple(game_size))
+        level = self.levels.get(key)
+        if level is None:
+            level = LevelCreator.create_level(number, self.get_layout(number),
+                                              game_size)
+            self.levels[key] = level
+        return level.copy()
+
+
+def parse_layout(text):
+    options = {}
+    lines = text.splitlines()
+    while lines and ':' in lines[0]:
+        key, value = lines.pop(0).split(':', 1)
+        options[key.strip()] = int(value)
+    rows = [line.strip() for line in lines if line.strip()]
+    cells = [(i, j) for i, row in enumerate(rows)
+             for j, cell in enumerate(row) if cell == '#']
+    width = options.get('width', max((len(row) for row in rows), default=0))
+    return Layout(options.get('top', 50), width, cells)
 
 
 class LevelCreator:
     @staticmethod
-    def get_levels(game_size):
-        levels = {}
-        w_num = 10
-        h_num = 11
-        level = 1
-        width = (game_size.width - w_num * settings.BRICK_SIZE.width) / 2
-        height = 50
-
-        blocks = set()
-        for i in range(h_num):
-            for j in range(w_num):
-                if i % 2 == 0 or j == 0 or j == 9:
-                    blocks.add(LevelCreator._create_block(width, height, i, j))
-
-        levels[level] = Level(level, blocks)
-
-        level = 2
-        height = 50
-        blocks = set()
-        for i in range(11):
-            for j in range(i % 2, 11, 2):
-                blocks.add(LevelCreator._create_block(width, height, i, j))
-
-        levels[level] = Level(level, blocks)
-
-        level = 3
-        height = 100
-        blocks = set()
-        for i in range(10):
-            for j in range(10):
-                blocks.add(LevelCreator._create_block(width, height, i, j))
-
-        levels[level] = Level(level, blocks)
-        return levels
+    def get_levels(game_size, registry=None):
+        registry = registry or LEVELS
+        return {number: registry.get_level(number, game_size)
+                for number in sorted(registry.paths)}
+
+    @staticmethod
+    def create_level(number, layout, game_size):
+        width = (game_size.width -
+                 layout.width * settings.BRICK_SIZE.width) / 2
+        blocks = {LevelCreator._create_block(width, layout.top, i, j)
+                  for i, j in layout.cells}
+        return Level(number, blocks)
 
     @staticmethod
     def _create_block(width, height, i, j):
@@ -55,3 +129,7 @@ class LevelCreator:
         block_x = width + settings.BRICK_SIZE.width * j
         block_y = height + settings.BRICK_SIZE.height * i
         return block_x, block_y
+
+
+LEVELS = LevelRegistry(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    'levels'))
@@ -0,0 +1,161 @@
+import hashlib
+import os
+import random
+import sys
+import settings
+from level import Layout, LevelCreator
+from levelpack import LevelPack, write_level_pack
+
+VERSION = 1
+CACHE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               '.level_cache')
+FAMILIES = ('noise', 'blocks', 'stripes', 'diamonds')
+SYMMETRIES = ('none', 'mirror', 'quad', 'rotate')
+BLOCK_SIZE = 4
+
+
+def noise(rnd, rows, columns, density):
+    values = [[rnd.random() for _ in range(columns)] for _ in range(rows)]
+    return lambda i, j: values[i][j] < density
+
+
+def blocks(rnd, rows, columns, density):
+    values = [[rnd.random() for _ in range(columns // BLOCK_SIZE + 1)]
+              for _ in range(rows // BLOCK_SIZE + 1)]
+    return lambda i, j: values[i // BLOCK_SIZE][j // BLOCK_SIZE] < density
+
+
+def stripes(rnd, rows, columns, density):
+    bands = []
+    while len(bands) < rows:
+        bands.extend([rnd.random() < density] * rnd.randint(1, 3))
+    gaps = [[rnd.random() < 0.1 for _ in range(columns)] for _ in range(rows)]
+    return lambda i, j: bands[i] and not gaps[i][j]
+
+
+def diamonds(rnd, rows, columns, density):
+    period = rnd.randint(3, 8)
+    center_row, center_column = rnd.randrange(rows), rnd.randrange(columns)
+    return lambda i, j: \
+        (abs(i - center_row) + abs(j - center_column)) % period < \
+        period * density
+
+
+PATTERNS = {'noise': noise, 'blocks': blocks, 'stripes': stripes,
+            'diamonds': diamonds}
+
+
+def generate_layout(seed, rows, columns, density=0.5, symmetry='mirror',
+                    family='noise', top=50):
+    if family not in PATTERNS:
+        raise ValueError('unknown pattern family %r' % family)
+    if symmetry not in SYMMETRIES:
+        raise ValueError('unknown symmetry %r' % symmetry)
+    pattern = PATTERNS[family](random.Random(seed), rows, columns, density)
+    cells = []
+    for i in range(rows):
+        for j in range(columns):
+            row, column = i, j
+            if symmetry in ('mirror', 'quad'):
+                column = min(j, columns - 1 - j)
+            if symmetry == 'quad':
+                row = min(i, rows - 1 - i)
+            if symmetry == 'rotate' and \
+                    (i, j) > (rows - 1 - i, columns - 1 - j):
+                row, column = rows - 1 - i, columns - 1 - j
+            if pattern(row, column):
+                cells.append((i, j))
+    return Layout(top, columns, cells)
+
+
+class LevelGenerator:
+    def __init__(self, seed=0, count=1, rows=None, columns=None, density=0.5,
+                 symmetry='mirror', family='noise', top=50,
+                 directory=CACHE_DIRECTORY):
+        self.seed = seed
+        self.count = count
+        self.rows = rows
+        self.columns = columns
+        self.density = density
+        self.symmetry = symmetry
+        self.family = family
+        self.top = top
+        self.directory = directory
+        self.levels = {}
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, number):
+        return 1 <= number <= self.count
+
+    def get_dimensions(self, game_size):
+        rows = self.rows or max(
+            1, int((game_size.height / 2 - self.top) //
+                   settings.BRICK_SIZE.height))
+        columns = self.columns or int(game_size.width //
+                                      settings.BRICK_SIZE.width)
+        return rows, columns
+
+    def get_seed(self, number):
+        return '%s/%s' % (self.seed, number)
+
+    def get_path(self, number, game_size):
+        key = repr((VERSION, self.get_seed(number), self.rows, self.columns,
+                    self.density, self.symmetry, self.family, self.top,
+                    tuple(game_size)))
+        name = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self.directory, name + '.pack')
+
+    def read_cache(self, path, number):
+        try:
+            pack = LevelPack(path)
+        except (OSError, ValueError):
+            return None
+        try:
+            return pack.get_layout(number)
+        except (KeyError, ValueError):
+            return None
+        finally:
+            pack.close()
+
+    def get_layout(self, number, game_size):
+        path = self.get_path(number, game_size)
+        layout = self.read_cache(path, number)
+        if layout is not None:
+            return layout
+        rows, columns = self.get_dimensions(game_size)
+        layout = generate_layout(self.get_seed(number), rows, columns,
+                                 self.density, self.symmetry, self.family,
+                                 self.top)
+        os.makedirs(self.directory, exist_ok=True)
+        temporary = '%s.%s.tmp' % (path, os.getpid())
+        try:
+            write_level_pack(temporary, {number: layout})
+            os.replace(temporary, path)
+        except OSError:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return layout
+
+    def get_level(self, number, game_size):
+        key = (number, tuple(game_size))
+        level = self.levels.get(key)
+        if level is None:
+            level = LevelCreator.create_level(
+                number, self.get_layout(number, game_size), game_size)
+            self.levels[key] = level
+        return level.copy()
+
+
+if __name__ == '__main__':
+    seed, rows, columns = (int(value) for value in sys.argv[1:4])
+    family = sys.argv[4] if len(sys.argv) > 4 else 'noise'
+    layout = generate_layout(seed, rows, columns, family=family)
+    print('top: %s' % layout.top)
+    print('width: %s' % layout.width)
+    filled = set(layout.cells)
+    for i in range(rows):
+        print(''.join('#' if (i, j) in filled else '.'
+                      for j in range(columns)))
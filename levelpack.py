@@ -0,0 +1,260 @@
+import math
+import mmap
+import struct
+import sys
+import settings
+from core import Frame
+from entities import Brick
+from level import Layout, LevelRegistry
+
+MAGIC = b'ARKP'
+VERSION = 1
+HEADER = struct.Struct('<4sBH')
+ENTRY = struct.Struct('<HiHHIQQ')
+ROW = struct.Struct('<I')
+RECORD = struct.Struct('<HHBB')
+
+
+def write_level_pack(path, layouts, colors=None):
+    colors = colors or {}
+    numbers = sorted(layouts)
+    offset = HEADER.size + ENTRY.size * len(numbers)
+    entries = []
+    bodies = []
+    for number in numbers:
+        layout = layouts[number]
+        cells = sorted(layout.cells)
+        rows = cells[-1][0] + 1 if cells else 0
+        row_starts = [0] * (rows + 1)
+        for row, _ in cells:
+            row_starts[row + 1] += 1
+        for row in range(rows):
+            row_starts[row + 1] += row_starts[row]
+
+        rows_offset = offset
+        records_offset = rows_offset + ROW.size * len(row_starts)
+        entries.append(ENTRY.pack(number, layout.top, layout.width, rows,
+                                  len(cells), rows_offset, records_offset))
+        bodies.extend(ROW.pack(start) for start in row_starts)
+        bodies.extend(RECORD.pack(row, column, colors.get((row, column), 0), 0)
+                      for row, column in cells)
+        offset = records_offset + RECORD.size * len(cells)
+
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(numbers)))
+        file.write(b''.join(entries))
+        file.write(b''.join(bodies))
+
+
+class LevelPack:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.data) < HEADER.size or \
+                HEADER.unpack_from(self.data)[:2] != (MAGIC, VERSION):
+            self.data.close()
+            raise ValueError('%s is not a level pack of version %s'
+                             % (path, VERSION))
+        count = HEADER.unpack_from(self.data)[2]
+        if len(self.data) < HEADER.size + ENTRY.size * count:
+            self.data.close()
+            raise ValueError('%s is truncated' % path)
+        self.entries = {}
+        for index in range(count):
+            entry = ENTRY.unpack_from(self.data,
+                                      HEADER.size + ENTRY.size * index)
+            self.entries[entry[0]] = entry[1:]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, number):
+        return number in self.entries
+
+    def get_level(self, number, game_size):
+        return PackedLevel(self, number, game_size)
+
+    def get_layout(self, number):
+        top, width, _, count, _, records_offset = self.entries[number]
+        data = self.data[records_offset:records_offset + RECORD.size * count]
+        if len(data) != RECORD.size * count:
+            raise ValueError('%s is truncated' % self.path)
+        cells = [(row, column)
+                 for row, column, _, _ in RECORD.iter_unpack(data)]
+        return Layout(top, width, cells)
+
+    def close(self):
+        self.data.close()
+
+
+class PackedLevel:
+    def __init__(self, pack, number, game_size, destroyed=None):
+        self.pack = pack
+        self.lvl = number
+        self.game_size = game_size
+        self.top, width, self.rows, self.count, self.rows_offset, \
+            self.records_offset = pack.entries[number]
+        self.left = (game_size.width - width * settings.BRICK_SIZE.width) / 2
+        if destroyed is None:
+            destroyed = bytearray((self.count + 7) // 8)
+        self.destroyed = destroyed
+        self.frozen = None
+        self.alive = self.count - sum(bin(byte).count('1')
+                                      for byte in destroyed)
+        self.bricks = {}
+        self.dirty = bytearray(len(destroyed))
+        self.smashed = PackedSmashed(self)
+        self.blocks = PackedBlocks(self)
+        self.grid = self
+
+    def copy(self):
+        return PackedLevel(self.pack, self.lvl, self.game_size,
+                           bytearray(self.destroyed))
+
+    def is_alive(self, index):
+        return not self.destroyed[index >> 3] & (1 << (index & 7))
+
+    def create_brick(self, index):
+        row, column, color, _ = RECORD.unpack_from(
+            self.pack.data, self.records_offset + RECORD.size * index)
+        brick = Brick(self.left + settings.BRICK_SIZE.width * column,
+                      self.top + settings.BRICK_SIZE.height * row, color)
+        brick.index = index
+        return brick
+
+    def get_brick(self, index):
+        brick = self.bricks.get(index)
+        if brick is None:
+            brick = self.create_brick(index)
+            self.bricks[index] = brick
+        return brick
+
+    def find(self, row, column):
+        data = self.pack.data
+        offset = self.rows_offset + ROW.size * row
+        low, = ROW.unpack_from(data, offset)
+        high, = ROW.unpack_from(data, offset + ROW.size)
+        while low < high:
+            middle = (low + high) // 2
+            current = RECORD.unpack_from(
+                data, self.records_offset + RECORD.size * middle)[1]
+            if current < column:
+                low = middle + 1
+            elif current > column:
+                high = middle
+            else:
+                return middle
+        return None
+
+    def _candidates(self, left, top, right, bottom):
+        width, height = settings.BRICK_SIZE
+        first_row = max(0, math.ceil((top - self.top) / height) - 1)
+        last_row = min(self.rows - 1,
+                       math.floor((bottom - self.top) / height))
+        first_column = max(0, math.ceil((left - self.left) / width) - 1)
+        last_column = math.floor((right - self.left) / width)
+        for row in range(first_row, last_row + 1):
+            for column in range(first_column, last_column + 1):
+                index = self.find(row, column)
+                if index is not None and self.is_alive(index):
+                    yield index
+
+    def count_area(self, left, top, right, bottom):
+        return sum(1 for _ in self._candidates(left, top, right, bottom))
+
+    def query(self, frame):
+        found = set()
+        for index in self._candidates(frame.left, frame.top, frame.right,
+                                      frame.bottom):
+            brick = self.get_brick(index)
+            if brick.frame.intersects_with(frame):
+                found.add(brick)
+        return found
+
+    def get_intersecting(self, entity):
+        return self.query(entity.frame)
+
+    def query_all(self, x, y, width, height, count):
+        for index in range(count):
+            found = self.query(Frame(x[index], y[index], width[index],
+                                     height[index]))
+            if found:
+                yield index, found
+
+    def remove_blocks(self, blocks):
+        for block in blocks:
+            index = block.index
+            if not self.is_alive(index):
+                continue
+            self.destroyed[index >> 3] |= 1 << (index & 7)
+            self.dirty[index >> 3] |= 1 << (index & 7)
+            self.alive -= 1
+            self.bricks.pop(index, None)
+            self.frozen = None
+
+    def snapshot(self):
+        if self.frozen is None:
+            self.frozen = bytes(self.destroyed)
+        return self.frozen
+
+    def restore(self, destroyed):
+        if destroyed is self.frozen:
+            return
+        current = int.from_bytes(self.destroyed, 'little')
+        target = int.from_bytes(destroyed, 'little')
+        restored = current & ~target
+        if restored:
+            dirty = int.from_bytes(self.dirty, 'little') | restored
+            self.dirty[:] = dirty.to_bytes(len(self.dirty), 'little')
+        self.destroyed = bytearray(destroyed)
+        self.alive = self.count - bin(target).count('1')
+        self.frozen = destroyed
+
+
+class PackedSmashed:
+    def __init__(self, level):
+        self.level = level
+
+    def __len__(self):
+        return bin(int.from_bytes(self.level.dirty, 'little')).count('1')
+
+    def __bool__(self):
+        return any(self.level.dirty)
+
+    def __iter__(self):
+        level = self.level
+        dirty = int.from_bytes(level.dirty, 'little')
+        while dirty:
+            lowest = dirty & -dirty
+            index = lowest.bit_length() - 1
+            yield level.bricks.get(index) or level.create_brick(index)
+            dirty ^= lowest
+
+    def clear(self):
+        dirty = self.level.dirty
+        dirty[:] = bytes(len(dirty))
+
+
+class PackedBlocks:
+    def __init__(self, level):
+        self.level = level
+
+    def __len__(self):
+        return self.level.alive
+
+    def __iter__(self):
+        level = self.level
+        for index in range(level.count):
+            if level.is_alive(index):
+                yield level.bricks.get(index) or level.create_brick(index)
+
+    def __contains__(self, brick):
+        return getattr(brick, 'index', None) is not None and \
+            self.level.is_alive(brick.index)
+
+
+if __name__ == '__main__':
+    registry = LevelRegistry(sys.argv[1])
+    write_level_pack(sys.argv[2], {number: registry.get_layout(number)
+                                   for number in registry.paths})
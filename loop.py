@@ -0,0 +1,38 @@
+import settings
+
+
+class FixedStepLoop:
+    def __init__(self, game, step=settings.TICK_DURATION, max_steps=5,
+                 tick=None):
+        self.game = game
+        self.tick = tick or game.tick
+        self.step = step
+        self.max_steps = max_steps
+        self.accumulator = 0
+        self.previous = {}
+
+    @property
+    def alpha(self):
+        return self.accumulator / self.step
+
+    def advance(self, elapsed, turn_rate=0):
+        self.accumulator += elapsed
+        ticks = 0
+        while self.accumulator >= self.step:
+            if ticks == self.max_steps:
+                self.accumulator = 0
+                break
+            self.previous = {entity: (entity.x, entity.y)
+                             for entity in self.game.get_moving_entities()}
+            self.tick(turn_rate)
+            self.accumulator -= self.step
+            ticks += 1
+        return ticks
+
+    def get_location(self, entity):
+        previous = self.previous.get(entity)
+        if previous is None:
+            return entity.x, entity.y
+        alpha = self.alpha
+        return (previous[0] + (entity.x - previous[0]) * alpha,
+                previous[1] + (entity.y - previous[1]) * alpha)
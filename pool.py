@@ -0,0 +1,60 @@
+class EntityPool:
+    def __init__(self, factory):
+        self.factory = factory
+        self.free = []
+
+    def acquire(self, x, y):
+        if not self.free:
+            return self.factory(x, y)
+        entity = self.free.pop()
+        entity.location = (x, y)
+        return entity
+
+    def release(self, entity):
+        self.free.append(entity)
+
+
+class ActiveList:
+    def __init__(self, capacity):
+        self.items = [None] * capacity
+        self.capacity = capacity
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return self.items[index]
+
+    def __iter__(self):
+        items = self.items
+        for index in range(self.count):
+            yield items[index]
+
+    def __contains__(self, entity):
+        return entity in self.items[:self.count]
+
+    def add(self, entity):
+        if self.count == self.capacity:
+            return False
+        self.items[self.count] = entity
+        self.count += 1
+        return True
+
+    def remove_at(self, index):
+        last = self.count - 1
+        entity = self.items[index]
+        self.items[index] = self.items[last]
+        self.items[last] = None
+        self.count = last
+        return entity
+
+    def remove(self, entity):
+        self.remove_at(self.items.index(entity, 0, self.count))
+
+    def clear(self):
+        for index in range(self.count):
+            self.items[index] = None
+        self.count = 0
@@ -0,0 +1,122 @@
+import math
+import sys
+from array import array
+from time import perf_counter
+
+COUNTERS = ('collision_tests', 'allocated_blocks', 'entities')
+
+
+class RingBuffer:
+    def __init__(self, capacity, typecode='d'):
+        self.values = array(typecode, [0]) * capacity
+        self.capacity = capacity
+        self.index = 0
+        self.count = 0
+
+    def append(self, value):
+        self.values[self.index] = value
+        self.index = (self.index + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def percentile(self, percent):
+        if self.count == 0:
+            return 0
+        ordered = sorted(self.values[:self.count])
+        rank = max(1, math.ceil(percent / 100 * self.count))
+        return ordered[rank - 1]
+
+
+class TickProfiler:
+    def __init__(self, phases, capacity=1024):
+        self.phases = phases
+        self.timings = {name: RingBuffer(capacity) for name, _ in phases}
+        self.timings['total'] = RingBuffer(capacity)
+        self.counters = {counter: RingBuffer(capacity, 'q')
+                         for counter in COUNTERS}
+        self.collision_counters = {
+            'ball': self._count_swept_candidates,
+            'collision': self._count_ball_candidates,
+            'bonuses': self._count_bonus_tests,
+            'bullets': self._count_bullet_candidates,
+            'paddle': self._count_paddle_tests,
+        }
+
+    def profile_tick(self, game, turn_rate, time_step):
+        timings = self.timings
+        collision_counters = self.collision_counters
+        collision_tests = 0
+        blocks = 0
+        total = 0
+        for name, phase in self.phases:
+            count = collision_counters.get(name)
+            if count is not None:
+                collision_tests += count(game, time_step)
+            allocated = sys.getallocatedblocks()
+            start = perf_counter()
+            phase(game, turn_rate, time_step)
+            elapsed = perf_counter() - start
+            blocks += sys.getallocatedblocks() - allocated
+            timings[name].append(elapsed)
+            total += elapsed
+        timings['total'].append(total)
+
+        self.counters['collision_tests'].append(collision_tests)
+        self.counters['allocated_blocks'].append(blocks)
+        self.counters['entities'].append(
+            1 + len(game.balls) + len(game.level.blocks) + len(game.bullets) +
+            len(game.bonuses))
+
+    @staticmethod
+    def _count_swept_candidates(game, time_step):
+        if not game.swept:
+            return 0
+        balls, count_area = game.balls, game.level.grid.count_area
+        x, y, width, height = balls.x, balls.y, balls.width, balls.height
+        dx, dy, velocity = balls.dx, balls.dy, balls.velocity
+        count = 0
+        for index in range(balls.count):
+            distance = velocity[index] * time_step
+            delta_x, delta_y = dx[index] * distance, dy[index] * distance
+            left, top = x[index], y[index]
+            count += count_area(left + min(delta_x, 0), top + min(delta_y, 0),
+                                left + width[index] + max(delta_x, 0),
+                                top + height[index] + max(delta_y, 0))
+        return count
+
+    @staticmethod
+    def _count_ball_candidates(game, time_step):
+        if game.swept:
+            return 0
+        balls, count_area = game.balls, game.level.grid.count_area
+        x, y, width, height = balls.x, balls.y, balls.width, balls.height
+        return sum(count_area(x[index], y[index], x[index] + width[index],
+                              y[index] + height[index])
+                   for index in range(balls.count))
+
+    @staticmethod
+    def _count_bonus_tests(game, time_step):
+        return 2 * len(game.bonuses)
+
+    @staticmethod
+    def _count_bullet_candidates(game, time_step):
+        count_area = game.level.grid.count_area
+        count = len(game.bullets)
+        for bullet in game.bullets:
+            distance = bullet.velocity * time_step
+            left = bullet.x + bullet.direction.x * distance
+            top = bullet.y + bullet.direction.y * distance
+            count += count_area(left, top, left + bullet.width,
+                                top + bullet.height)
+        return count
+
+    @staticmethod
+    def _count_paddle_tests(game, time_step):
+        return len(game.balls)
+
+    def summary(self, percents=(50, 95, 99)):
+        result = {}
+        for name, buffer in list(self.timings.items()) + \
+                list(self.counters.items()):
+            result[name] = {'p%s' % percent: buffer.percentile(percent)
+                            for percent in percents}
+        return result
@@ -0,0 +1,101 @@
+import os.path
+import numpy as np
+
+BACKGROUND = (0, 0, 0)
+BONUS_COLOR = (60, 200, 90)
+COLORS = {
+    'ship': (200, 200, 220),
+    'ball': (235, 235, 235),
+    'fireballbonus': (250, 120, 40),
+    'bullet': (250, 210, 60),
+    'brick': (70, 130, 220),
+}
+
+
+def load_sprite(path, width, height):
+    try:
+        from PyQt5.QtCore import Qt
+        from PyQt5.QtGui import QImage
+    except ImportError:
+        return None
+    image = QImage(path)
+    if image.isNull():
+        return None
+    image = image.scaled(width, height, Qt.IgnoreAspectRatio,
+                         Qt.SmoothTransformation)
+    image = image.convertToFormat(QImage.Format_RGBA8888)
+    bits = image.constBits()
+    bits.setsize(image.byteCount())
+    pixels = np.frombuffer(bits, np.uint8).reshape(
+        height, image.bytesPerLine() // 4, 4)[:, :width]
+    return pixels[..., :3].copy(), pixels[..., 3] > 127
+
+
+class Rasterizer:
+    def __init__(self, game_size, width, height, sprites=True):
+        self.scale_x = width / game_size.width
+        self.scale_y = height / game_size.height
+        self.width = width
+        self.height = height
+        self.sprites = sprites
+        self.cache = {}
+        self.background = np.empty((height, width, 3), np.uint8)
+        self.level = None
+        self.blocks = None
+
+    def get_sprite(self, path, width, height):
+        key = (path, width, height)
+        sprite = self.cache.get(key)
+        if sprite is None:
+            sprite = self.sprites and load_sprite(path, width, height)
+            if not sprite:
+                name = os.path.splitext(os.path.basename(path))[0]
+                color = COLORS.get(name, BONUS_COLOR)
+                sprite = (np.broadcast_to(np.array(color, np.uint8),
+                                          (height, width, 3)),
+                          np.ones((height, width), bool))
+            self.cache[key] = sprite
+        return sprite
+
+    def group(self, entities):
+        groups = {}
+        scale_x, scale_y = self.scale_x, self.scale_y
+        for entity in entities:
+            frame = entity.frame
+            key = (entity.get_image(),
+                   max(1, round(frame.width * scale_x)),
+                   max(1, round(frame.height * scale_y)))
+            locations = groups.get(key)
+            if locations is None:
+                locations = groups[key] = []
+            locations.append((frame.x * scale_x, frame.y * scale_y))
+        return groups
+
+    def blit(self, target, groups):
+        for (path, width, height), locations in groups.items():
+            pixels, mask = self.get_sprite(path, width, height)
+            corners = np.rint(np.array(locations)).astype(np.intp)
+            rows = corners[:, 1, None, None] + np.arange(height)[:, None]
+            columns = corners[:, 0, None, None] + np.arange(width)
+            rows, columns = np.broadcast_arrays(rows, columns)
+            visible = mask & (rows >= 0) & (rows < self.height) & \
+                (columns >= 0) & (columns < self.width)
+            target[rows[visible], columns[visible]] = \
+                np.broadcast_to(pixels, visible.shape + (3,))[visible]
+
+    def update_background(self, level):
+        blocks = level.snapshot()
+        if level is self.level and blocks is self.blocks:
+            return
+        self.level = level
+        self.blocks = blocks
+        self.background[:] = BACKGROUND
+        self.blit(self.background, self.group(level.blocks))
+
+    def render(self, game, out=None):
+        if out is None:
+            out = np.empty_like(self.background)
+        self.update_background(game.level)
+        np.copyto(out, self.background)
+        self.blit(out, self.group(game.get_moving_entities()))
+        return out
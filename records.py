@@ -0,0 +1,21 @@
+import struct
+
+HEADER = struct.Struct('<4sB')
+
+
+def write_header(file, magic, version):
+    if file.tell() == 0:
+        file.write(HEADER.pack(magic, version))
+
+
+def read_records(path, magic, version, record, description):
+    with open(path, 'rb') as file:
+        data = file.read()
+    if not data:
+        return
+    if len(data) < HEADER.size or \
+            HEADER.unpack_from(data) != (magic, version):
+        raise ValueError('%s is not a %s file of version %s'
+                         % (path, description, version))
+    end = len(data) - (len(data) - HEADER.size) % record.size
+    yield from record.iter_unpack(memoryview(data)[HEADER.size:end])
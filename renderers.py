@@ -0,0 +1,124 @@
+from PyQt5.QtCore import Qt, QRectF
+from PyQt5.QtGui import QPixmap, QRegion
+from PyQt5.QtWidgets import QFrame, QGraphicsScene, QGraphicsView
+from sprites import BrickLayer
+
+
+class PainterRenderer:
+    def __init__(self, sprites, parent=None):
+        self.sprites = sprites
+        self.brick_layer = BrickLayer(sprites)
+        self.drawn_rects = []
+        self.widget = None
+
+    def update(self, game, size, get_location):
+        region = QRegion()
+        for rect in self.brick_layer.update(game.level, size):
+            region += rect
+
+        rects = []
+        for entity in game.get_moving_entities():
+            x, y = get_location(entity)
+            rects.append(QRectF(x, y, entity.width, entity.height)
+                         .toAlignedRect().adjusted(-1, -1, 1, 1))
+        for rect in self.drawn_rects + rects:
+            region += rect
+        self.drawn_rects = rects
+        return region
+
+    def draw(self, painter, game, rect, size, get_location):
+        self.brick_layer.update(game.level, size)
+        self.brick_layer.draw(painter, rect)
+        self.sprites.draw(painter, game.get_moving_entities(), get_location)
+
+
+class SceneRenderer:
+    def __init__(self, sprites, parent=None):
+        self.sprites = sprites
+        self.pixmaps = {}
+        self.scene = QGraphicsScene()
+        self.widget = QGraphicsView(self.scene, parent)
+        self.widget.setAlignment(Qt.AlignLeft | Qt.AlignTop)
+        self.widget.setFrameShape(QFrame.NoFrame)
+        self.widget.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.widget.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.widget.setStyleSheet('background: transparent')
+        self.widget.setFocusPolicy(Qt.NoFocus)
+        self.widget.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.level = None
+        self.bricks = {}
+        self.items = {}
+        self.free = {}
+
+    def get_pixmap(self, entity):
+        key = (entity.get_image(), int(round(entity.width)),
+               int(round(entity.height)))
+        pixmap = self.pixmaps.get(key)
+        if pixmap is None:
+            pixmap = QPixmap.fromImage(self.sprites.get_image(key[0]).scaled(
+                key[1], key[2], Qt.IgnoreAspectRatio,
+                Qt.SmoothTransformation))
+            self.pixmaps[key] = pixmap
+        return key, pixmap
+
+    def add_brick(self, block):
+        _, pixmap = self.get_pixmap(block)
+        item = self.scene.addPixmap(pixmap)
+        item.setPos(*block.location)
+        self.bricks[tuple(block.location)] = item
+
+    def update_bricks(self, level):
+        if level is not self.level:
+            for item in self.bricks.values():
+                self.scene.removeItem(item)
+            self.bricks = {}
+            self.level = level
+            for block in level.blocks:
+                self.add_brick(block)
+        else:
+            for block in level.smashed:
+                item = self.bricks.pop(tuple(block.location), None)
+                if item is not None:
+                    self.scene.removeItem(item)
+                for neighbour in level.get_intersecting(block):
+                    if tuple(neighbour.location) not in self.bricks:
+                        self.add_brick(neighbour)
+        level.smashed.clear()
+
+    def get_item(self, key, pixmap):
+        free = self.free.get(key)
+        if free:
+            item = free.pop()
+            item.show()
+            return item
+        item = self.scene.addPixmap(pixmap)
+        item.setZValue(1)
+        return item
+
+    def update(self, game, size, get_location):
+        rect = QRectF(0, 0, size.width(), size.height())
+        if self.scene.sceneRect() != rect:
+            self.scene.setSceneRect(rect)
+        self.update_bricks(game.level)
+
+        items = {}
+        for entity in game.get_moving_entities():
+            key, item = self.items.pop(entity, (None, None))
+            new_key, pixmap = self.get_pixmap(entity)
+            if item is None:
+                item = self.get_item(new_key, pixmap)
+            elif key != new_key:
+                item.setPixmap(pixmap)
+            item.setPos(*get_location(entity))
+            items[entity] = (new_key, item)
+        for key, item in self.items.values():
+            item.hide()
+            self.free.setdefault(key, []).append(item)
+        self.items = items
+        return QRegion()
+
+    def draw(self, painter, game, rect, size, get_location):
+        pass
+
+
+RENDERERS = {'painter': PainterRenderer, 'scene': SceneRenderer}
@@ -0,0 +1,143 @@
+import struct
+from collections import namedtuple
+from core import Size
+from game import GameModel
+
+TickInput = namedtuple('TickInput', ['turn_rate', 'mouse_x', 'release',
+                                     'shoot'])
+
+MAGIC = b'ARKR'
+VERSION = 1
+HEADER = struct.Struct('<4sBQHHB')
+RECORD = struct.Struct('<bBh')
+MAX_SEED = 2 ** 64 - 1
+
+RELEASE = 1
+SHOOT = 2
+MOUSE = 4
+
+
+def apply_input(game, tick_input):
+    if tick_input.mouse_x is not None:
+        game.move_ship_to(tick_input.mouse_x)
+    if tick_input.release:
+        game.release_ball()
+    if tick_input.shoot:
+        game.shooting()
+    game.tick(tick_input.turn_rate)
+
+
+class Replay:
+    def __init__(self, size, seed, swept=False, inputs=None):
+        if not 0 <= seed <= MAX_SEED:
+            raise ValueError('Replay seed must be in [0, %s], got %s'
+                             % (MAX_SEED, seed))
+        self.size = size
+        self.seed = seed
+        self.swept = swept
+        self.inputs = inputs if inputs is not None else []
+
+    def __len__(self):
+        return len(self.inputs)
+
+    def create_game(self):
+        return GameModel(self.size, self.swept, self.seed)
+
+    def to_bytes(self):
+        chunks = [HEADER.pack(MAGIC, VERSION, self.seed, self.size.width,
+                              self.size.height, int(self.swept))]
+        for tick_input in self.inputs:
+            flags = RELEASE * tick_input.release | SHOOT * tick_input.shoot
+            mouse_x = 0
+            if tick_input.mouse_x is not None:
+                flags |= MOUSE
+                mouse_x = int(tick_input.mouse_x)
+            chunks.append(RECORD.pack(tick_input.turn_rate, flags, mouse_x))
+        return b''.join(chunks)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, seed, width, height, swept = \
+            HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Not a replay of version %s' % VERSION)
+        inputs = []
+        for turn_rate, flags, mouse_x in RECORD.iter_unpack(
+                memoryview(data)[HEADER.size:]):
+            inputs.append(TickInput(turn_rate,
+                                    mouse_x if flags & MOUSE else None,
+                                    bool(flags & RELEASE),
+                                    bool(flags & SHOOT)))
+        return cls(Size(width, height), seed, bool(swept), inputs)
+
+    def save(self, path):
+        with open(path, 'wb') as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            return cls.from_bytes(file.read())
+
+
+class ReplayRecorder:
+    def __init__(self, game):
+        self.game = game
+        self.replay = Replay(game.size, game.seed, game.swept)
+        self.mouse_x = None
+        self.release = False
+        self.shoot = False
+
+    def move_ship_to(self, x):
+        self.mouse_x = x
+
+    def release_ball(self):
+        self.release = True
+
+    def shooting(self):
+        self.shoot = True
+
+    def tick(self, turn_rate=0):
+        tick_input = TickInput(turn_rate, self.mouse_x, self.release,
+                               self.shoot)
+        self.mouse_x = None
+        self.release = self.shoot = False
+        self.replay.inputs.append(tick_input)
+        apply_input(self.game, tick_input)
+
+
+class ReplayPlayer:
+    def __init__(self, replay, keyframe_interval=600):
+        self.replay = replay
+        self.keyframe_interval = keyframe_interval
+        self.keyframes = {}
+        self.game = replay.create_game()
+        self.tick = 0
+        self._save_keyframe()
+
+    def _save_keyframe(self):
+        if self.tick % self.keyframe_interval == 0 and \
+                self.tick not in self.keyframes:
+            self.keyframes[self.tick] = self.game.snapshot()
+
+    def step(self):
+        if self.tick >= len(self.replay):
+            return False
+        apply_input(self.game, self.replay.inputs[self.tick])
+        self.tick += 1
+        self._save_keyframe()
+        return True
+
+    def play(self, until=None):
+        until = len(self.replay) if until is None else until
+        while self.tick < until and self.step():
+            pass
+        return self.game
+
+    def seek(self, tick):
+        tick = max(0, min(tick, len(self.replay)))
+        start = max(k for k in self.keyframes if k <= tick)
+        if not start <= self.tick <= tick:
+            self.game.restore(self.keyframes[start])
+            self.tick = start
+        return self.play(tick)
@@ -0,0 +1,155 @@
+import bisect
+import os
+import queue
+import struct
+import threading
+import time
+from collections import namedtuple
+from records import HEADER, read_records, write_header
+
+MAGIC = b'ARKS'
+VERSION = 1
+RECORD = struct.Struct('<qHBdQd')
+SEED_MASK = 2 ** 64 - 1
+MAX_LIVES = 255
+
+TOP_SIZE = 10
+COMPACT_AFTER = 1000
+
+Score = namedtuple('Score', ['score', 'level', 'lives', 'duration', 'seed',
+                             'timestamp'])
+
+
+def create_score(game, duration, timestamp=None):
+    level = game.current_level - 1 if game.won else game.current_level
+    return Score(game.player.score, level,
+                 min(game.player.lives, MAX_LIVES), duration,
+                 game.seed & SEED_MASK,
+                 time.time() if timestamp is None else timestamp)
+
+
+def read_scores(path):
+    for record in read_records(path, MAGIC, VERSION, RECORD, 'high score'):
+        yield Score(*record)
+
+
+class ScoreIndex:
+    def __init__(self, size=TOP_SIZE):
+        self.size = size
+        self.keys = []
+        self.top = []
+
+    def __len__(self):
+        return len(self.top)
+
+    def __iter__(self):
+        return iter(self.top)
+
+    def insert(self, score):
+        key = (-score.score, score.timestamp)
+        index = bisect.bisect_right(self.keys, key)
+        if index >= self.size:
+            return None
+        self.keys.insert(index, key)
+        self.top.insert(index, score)
+        del self.keys[self.size:]
+        del self.top[self.size:]
+        return index + 1
+
+
+class HighScores:
+    def __init__(self, path, size=TOP_SIZE, compact_after=COMPACT_AFTER,
+                 on_load=None):
+        self.path = path
+        self.size = size
+        self.compact_after = compact_after
+        self.on_load = on_load
+        self.index = ScoreIndex(size)
+        self.written = ScoreIndex(size)
+        self.records = 0
+        self.error = None
+        self.loaded = threading.Event()
+        self.queue = queue.Queue()
+        self.submit(self.load)
+        self.writer = threading.Thread(target=self.write, daemon=True)
+        self.writer.start()
+
+    def __len__(self):
+        return len(self.index)
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def load(self):
+        index = ScoreIndex(self.size)
+        written = ScoreIndex(self.size)
+        records = 0
+        try:
+            if os.path.exists(self.path):
+                try:
+                    for score in read_scores(self.path):
+                        index.insert(score)
+                        written.insert(score)
+                        records += 1
+                except ValueError as error:
+                    self.error = error
+                    os.replace(self.path, self.path + '.corrupt')
+                else:
+                    size = HEADER.size + RECORD.size * records
+                    if records and os.path.getsize(self.path) > size:
+                        with open(self.path, 'r+b') as file:
+                            file.truncate(size)
+        finally:
+            self.index, self.written, self.records = index, written, records
+            self.loaded.set()
+        if self.on_load is not None:
+            self.on_load()
+
+    def add(self, score):
+        record = RECORD.pack(*score)
+        self.loaded.wait()
+        rank = self.index.insert(score)
+        self.submit(self.append, score, record)
+        return rank
+
+    def submit(self, function, *args):
+        self.queue.put((function, args))
+
+    def write(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                function, args = item
+                function(*args)
+            except OSError as error:
+                self.error = error
+            finally:
+                self.queue.task_done()
+
+    def append(self, score, record):
+        with open(self.path, 'ab') as file:
+            write_header(file, MAGIC, VERSION)
+            file.write(record)
+        self.written.insert(score)
+        self.records += 1
+        if self.records > self.compact_after:
+            self.compact()
+
+    def compact(self):
+        top = list(self.written)
+        temporary = self.path + '.tmp'
+        with open(temporary, 'wb') as file:
+            write_header(file, MAGIC, VERSION)
+            for score in top:
+                file.write(RECORD.pack(*score))
+        os.replace(temporary, self.path)
+        self.records = len(top)
+
+    def flush(self):
+        self.queue.join()
+
+    def close(self):
+        self.queue.put(None)
+        self.writer.join()
@@ -15,3 +15,16 @@ BALL_DIRECTION = (-1, 1)
 SHIP_DIRECTION = (0, 0)
 BONUS_DIRECTION = (0, 1)
 BULLET_DIRECTION = (0, -1)
+
+MAX_BULLETS = 1024
+MAX_BONUSES = 1024
+MAX_BALLS = 512
+
+BONUS_DURATION = 1000
+
+TICK_DURATION = 12
+FRAME_INTERVAL = 4
+
+SPECTATOR_PORT = None
+RENDERER = 'painter'
+HIGH_SCORES_PATH = 'high_scores.dat'
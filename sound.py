@@ -0,0 +1,109 @@
+import os.path
+from time import monotonic
+from PyQt5.QtCore import QObject, QThread, QTimer, QUrl, pyqtSlot
+import events
+
+SOUND_DIRECTORY = 'sounds'
+EFFECTS = {
+    events.BRICK: 'brick.wav',
+    events.PADDLE: 'paddle.wav',
+    events.BONUS: 'bonus.wav',
+    events.DEATH: 'death.wav',
+}
+VOICES = 4
+DRAIN_INTERVAL = 5
+
+
+class VoicePool:
+    def __init__(self, voices):
+        self.voices = voices
+        self.started = [0.0] * len(voices)
+        self.stolen = 0
+
+    def find_voice(self):
+        oldest = 0
+        for index, voice in enumerate(self.voices):
+            if not voice.is_playing():
+                return index
+            if self.started[index] < self.started[oldest]:
+                oldest = index
+        return oldest
+
+    def play(self, effect, now):
+        index = self.find_voice()
+        voice = self.voices[index]
+        if voice.is_playing():
+            voice.stop()
+            self.stolen += 1
+        voice.play(effect)
+        self.started[index] = now
+        return index
+
+
+class QtVoice:
+    def __init__(self, sound_effect_cls, parent, source):
+        self.effect = sound_effect_cls(parent)
+        self.effect.setSource(source)
+        self.source = source
+
+    def is_playing(self):
+        return self.effect.isPlaying()
+
+    def stop(self):
+        self.effect.stop()
+
+    def play(self, source):
+        self.effect.play()
+
+
+class SoundEngine(QObject):
+    def __init__(self, events_queue=None, voices=VOICES,
+                 directory=SOUND_DIRECTORY, interval=DRAIN_INTERVAL):
+        super().__init__()
+        self.events = events_queue
+        self.voice_count = voices
+        self.directory = directory
+        self.interval = interval
+        self.sources = {}
+        self.pools = {}
+        self.timer = None
+        self.audio_thread = QThread()
+        self.moveToThread(self.audio_thread)
+        self.audio_thread.started.connect(self.setup)
+
+    def start(self):
+        self.audio_thread.start()
+
+    def stop(self):
+        self.audio_thread.quit()
+        self.audio_thread.wait()
+
+    def attach(self, events_queue):
+        self.events = events_queue
+
+    @pyqtSlot()
+    def setup(self):
+        try:
+            from PyQt5.QtMultimedia import QSoundEffect
+        except ImportError:
+            return
+        for event, name in EFFECTS.items():
+            source = QUrl.fromLocalFile(
+                os.path.abspath(os.path.join(self.directory, name)))
+            self.sources[event] = source
+            self.pools[event] = VoicePool(
+                [QtVoice(QSoundEffect, self, source)
+                 for _ in range(self.voice_count)])
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.drain)
+        self.timer.start(self.interval)
+
+    @pyqtSlot()
+    def drain(self):
+        if self.events is None:
+            return
+        now = monotonic()
+        for event in set(self.events.drain()):
+            pool = self.pools.get(event)
+            if pool is not None:
+                pool.play(self.sources[event], now)
@@ -0,0 +1,324 @@
+import asyncio
+import struct
+import sys
+import threading
+import weakref
+from collections import namedtuple
+import settings
+from bonuses import BONUSES
+from core import BallState, Size, compare
+from entities import Ball
+from game import GameModel
+
+KINDS = ('Ship', 'Ball', 'Bullet', 'Brick') + \
+    tuple(bonus_cls.__name__ for bonus_cls in BONUSES)
+KIND_IDS = {name: index for index, name in enumerate(KINDS)}
+BRICK = KIND_IDS['Brick']
+
+FRAME = struct.Struct('<I')
+HEADER = struct.Struct('<BI')
+SCORE = struct.Struct('<i')
+LIVES = struct.Struct('<h')
+LEVEL = struct.Struct('<H')
+COUNT = struct.Struct('<I')
+ID = struct.Struct('<I')
+ENTITY = struct.Struct('<IBBffHH')
+
+KEYFRAME = 1
+SCORE_CHANGED = 2
+LIVES_CHANGED = 4
+LEVEL_CHANGED = 8
+
+HIGH_WATER = 64 * 1024
+
+State = namedtuple('State', ['tick', 'score', 'lives', 'level', 'entities',
+                             'bricks', 'blocks'])
+
+
+class StateCapture:
+    def __init__(self):
+        self.ids = weakref.WeakKeyDictionary()
+        self.brick_ids = {}
+        self.next_id = 1
+        self.tick = 0
+        self.state = None
+
+    def get_id(self, ids, key):
+        entity_id = ids.get(key)
+        if entity_id is None:
+            entity_id = ids[key] = self.next_id
+            self.next_id += 1
+        return entity_id
+
+    def capture(self, game):
+        entities = {}
+        for entity in game.get_moving_entities():
+            state = entity.state.value if isinstance(entity, Ball) else 0
+            entities[self.get_id(self.ids, entity)] = (
+                KIND_IDS[type(entity).__name__], state, entity.x, entity.y,
+                entity.width, entity.height)
+
+        blocks = game.level.snapshot()
+        previous = self.state
+        if previous is not None and previous.blocks is blocks:
+            bricks = previous.bricks
+        else:
+            bricks = {}
+            for brick in game.level.blocks:
+                key = (game.current_level, brick.x, brick.y)
+                bricks[self.get_id(self.brick_ids, key)] = (
+                    BRICK, 0, brick.x, brick.y, brick.width, brick.height)
+
+        self.tick += 1
+        self.state = State(self.tick, game.player.score, game.player.lives,
+                           game.current_level, entities, bricks, blocks)
+        return self.state
+
+
+def _diff(previous, current, removed, changed):
+    for entity_id in previous.keys() - current.keys():
+        removed.append(entity_id)
+    for entity_id, record in current.items():
+        if previous.get(entity_id) != record:
+            changed.append((entity_id,) + record)
+
+
+def encode(previous, state):
+    flags = 0
+    chunks = []
+    if previous is None:
+        flags = KEYFRAME | SCORE_CHANGED | LIVES_CHANGED | LEVEL_CHANGED
+        previous = State(0, None, None, None, {}, {}, None)
+    if state.score != previous.score:
+        flags |= SCORE_CHANGED
+        chunks.append(SCORE.pack(state.score))
+    if state.lives != previous.lives:
+        flags |= LIVES_CHANGED
+        chunks.append(LIVES.pack(state.lives))
+    if state.level != previous.level:
+        flags |= LEVEL_CHANGED
+        chunks.append(LEVEL.pack(state.level))
+
+    removed = []
+    changed = []
+    _diff(previous.entities, state.entities, removed, changed)
+    if previous.bricks is not state.bricks:
+        _diff(previous.bricks, state.bricks, removed, changed)
+
+    chunks.append(COUNT.pack(len(removed)))
+    chunks.extend(ID.pack(entity_id) for entity_id in removed)
+    chunks.append(COUNT.pack(len(changed)))
+    chunks.extend(ENTITY.pack(*record) for record in changed)
+    payload = HEADER.pack(flags, state.tick) + b''.join(chunks)
+    return FRAME.pack(len(payload)) + payload
+
+
+class SpectatorView:
+    def __init__(self):
+        self.tick = 0
+        self.score = 0
+        self.lives = 0
+        self.level = 0
+        self.entities = {}
+        self.synced = False
+
+    def apply(self, payload):
+        flags, self.tick = HEADER.unpack_from(payload)
+        offset = HEADER.size
+        if flags & KEYFRAME:
+            self.entities.clear()
+            self.synced = True
+        if flags & SCORE_CHANGED:
+            self.score, = SCORE.unpack_from(payload, offset)
+            offset += SCORE.size
+        if flags & LIVES_CHANGED:
+            self.lives, = LIVES.unpack_from(payload, offset)
+            offset += LIVES.size
+        if flags & LEVEL_CHANGED:
+            self.level, = LEVEL.unpack_from(payload, offset)
+            offset += LEVEL.size
+
+        count, = COUNT.unpack_from(payload, offset)
+        offset += COUNT.size
+        for _ in range(count):
+            self.entities.pop(ID.unpack_from(payload, offset)[0], None)
+            offset += ID.size
+        count, = COUNT.unpack_from(payload, offset)
+        offset += COUNT.size
+        for _ in range(count):
+            entity_id, *record = ENTITY.unpack_from(payload, offset)
+            self.entities[entity_id] = tuple(record)
+            offset += ENTITY.size
+
+    def get_bricks(self):
+        return {entity_id: record for entity_id, record
+                in self.entities.items() if record[0] == BRICK}
+
+
+class Spectator:
+    def __init__(self, writer):
+        self.writer = writer
+        self.state = None
+        self.sent = 0
+        self.dropped = 0
+
+
+class SpectatorServer:
+    def __init__(self, high_water=HIGH_WATER):
+        self.high_water = high_water
+        self.capture = StateCapture()
+        self.spectators = set()
+        self.handlers = set()
+        self.server = None
+        self.loop = None
+
+    async def start(self, host='127.0.0.1', port=0):
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(self._connected, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    def start_in_thread(self, host='127.0.0.1', port=0):
+        started = threading.Event()
+        result = []
+
+        def run():
+            loop = asyncio.new_event_loop()
+            result.append(loop.run_until_complete(self.start(host, port)))
+            started.set()
+            loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        started.wait()
+        return result[0]
+
+    async def _connected(self, reader, writer):
+        spectator = self.add(writer)
+        handler = asyncio.current_task()
+        self.handlers.add(handler)
+        try:
+            while await reader.read(1024):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self.spectators.discard(spectator)
+            self.handlers.discard(handler)
+            writer.close()
+
+    def add(self, writer):
+        spectator = Spectator(writer)
+        self.spectators.add(spectator)
+        return spectator
+
+    def publish(self, game):
+        self.send(self.capture.capture(game))
+
+    def publish_threadsafe(self, game):
+        self.loop.call_soon_threadsafe(self.send, self.capture.capture(game))
+
+    def send(self, state):
+        messages = {}
+        for spectator in list(self.spectators):
+            writer = spectator.writer
+            if writer.is_closing():
+                self.spectators.discard(spectator)
+                continue
+            if writer.transport.get_write_buffer_size() > self.high_water:
+                spectator.dropped += 1
+                continue
+            key = id(spectator.state)
+            message = messages.get(key)
+            if message is None:
+                message = messages[key] = encode(spectator.state, state)
+            writer.write(message)
+            spectator.state = state
+            spectator.sent += 1
+
+    async def run(self, game, policy=None, ticks=None,
+                  interval=settings.TICK_DURATION / 1000):
+        tick = 0
+        while ticks is None or tick < ticks:
+            if game.gameover or game.won:
+                break
+            game.tick(policy(game) if policy else 0)
+            self.publish(game)
+            tick += 1
+            await asyncio.sleep(interval)
+
+    async def close(self):
+        for spectator in list(self.spectators):
+            spectator.writer.close()
+        self.spectators.clear()
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+
+class SpectatorClient:
+    def __init__(self):
+        self.view = SpectatorView()
+        self.reader = None
+        self.writer = None
+
+    async def connect(self, host, port):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+
+    async def receive(self):
+        size, = FRAME.unpack(await self.reader.readexactly(FRAME.size))
+        self.view.apply(await self.reader.readexactly(size))
+        return self.view
+
+    def close(self):
+        self.writer.close()
+
+
+class LocalSpectator:
+    def __init__(self):
+        self.view = SpectatorView()
+        self.transport = self
+        self.buffer = bytearray()
+        self.closed = False
+
+    def write(self, data):
+        self.buffer += data
+
+    def is_closing(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+    def get_write_buffer_size(self):
+        return len(self.buffer)
+
+    def receive(self):
+        received = 0
+        while len(self.buffer) >= FRAME.size:
+            size, = FRAME.unpack_from(self.buffer)
+            self.view.apply(bytes(self.buffer[FRAME.size:FRAME.size + size]))
+            del self.buffer[:FRAME.size + size]
+            received += 1
+        return received
+
+
+def follow_ball(game):
+    target = game.ball.x + (game.ball.width - game.ship.width) / 2
+    if game.ball.state == BallState.Caught:
+        game.release_ball()
+    return compare(target, game.ship.x)
+
+
+async def serve(port):
+    server = SpectatorServer()
+    await server.start('', port)
+    try:
+        while True:
+            game = GameModel(Size(1280, 800))
+            await server.run(game, follow_ball)
+    finally:
+        await server.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(serve(int(sys.argv[1]) if len(sys.argv) > 1 else 8765))
@@ -0,0 +1,126 @@
+from PyQt5.QtCore import Qt, QPointF, QRectF
+from PyQt5.QtGui import QImage, QPainter, QPixmap
+
+
+class SpriteAtlas:
+    ATLAS_WIDTH = 1024
+    PADDING = 1
+
+    def __init__(self):
+        self.images = {}
+        self.regions = {}
+        self.scaled = {}
+        self.pixmap = None
+
+    def get_image(self, path):
+        image = self.images.get(path)
+        if image is None:
+            image = QImage(path)
+            self.images[path] = image
+        return image
+
+    def get_scaled(self, path, width, height):
+        key = (path, width, height)
+        sprite = self.scaled.get(key)
+        if sprite is None:
+            sprite = self.get_image(path).scaled(
+                width, height, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+            self.scaled[key] = sprite
+        return sprite
+
+    def get_region(self, path, width, height):
+        key = (path, int(round(width)), int(round(height)))
+        region = self.regions.get(key)
+        if region is None:
+            self.regions[key] = None
+            self._build()
+            region = self.regions[key]
+        return region
+
+    def draw_image(self, painter, x, y, path):
+        image = self.get_image(path)
+        region = self.get_region(path, image.width(), image.height())
+        painter.drawPixmap(QPointF(x, y), self.pixmap, region)
+
+    def _build(self):
+        atlas_width = max([self.ATLAS_WIDTH] +
+                          [width for _, width, _ in self.regions])
+        x = y = row_height = 0
+        placement = {}
+        for key in sorted(self.regions, key=lambda k: -k[2]):
+            _, width, height = key
+            if x + width > atlas_width:
+                x, y = 0, y + row_height + self.PADDING
+                row_height = 0
+            placement[key] = QRectF(x, y, width, height)
+            x += width + self.PADDING
+            row_height = max(row_height, height)
+
+        atlas = QImage(atlas_width, max(1, y + row_height),
+                       QImage.Format_ARGB32_Premultiplied)
+        atlas.fill(Qt.transparent)
+        painter = QPainter(atlas)
+        for key, region in placement.items():
+            painter.drawImage(region.topLeft(), self.get_scaled(*key))
+        painter.end()
+
+        self.regions = placement
+        self.pixmap = QPixmap.fromImage(atlas)
+
+    def draw(self, painter, entities, get_location=None):
+        sprites = [(entity, entity.get_image()) for entity in entities]
+        for entity, path in sprites:
+            key = (path, int(round(entity.width)), int(round(entity.height)))
+            if key not in self.regions:
+                self.regions[key] = None
+        if None in self.regions.values():
+            self._build()
+
+        fragments = []
+        for entity, path in sprites:
+            region = self.get_region(path, entity.width, entity.height)
+            x, y = get_location(entity) if get_location else entity.location
+            fragments.append(QPainter.PixmapFragment.create(
+                QPointF(x + entity.width / 2, y + entity.height / 2), region,
+                entity.width / region.width(),
+                entity.height / region.height()))
+        if fragments:
+            painter.drawPixmapFragments(fragments, self.pixmap)
+
+
+class BrickLayer:
+    def __init__(self, sprites):
+        self.sprites = sprites
+        self.level = None
+        self.pixmap = None
+
+    def update(self, level, size):
+        if level is not self.level or self.pixmap.size() != size:
+            self.level = level
+            self.pixmap = QPixmap(size)
+            self.pixmap.fill(Qt.transparent)
+            painter = QPainter(self.pixmap)
+            self.sprites.draw(painter, level.blocks)
+            painter.end()
+            level.smashed.clear()
+            return [self.pixmap.rect()]
+
+        rects = []
+        if level.smashed:
+            painter = QPainter(self.pixmap)
+            for block in level.smashed:
+                rect = QRectF(*block.location, block.width,
+                              block.height).toAlignedRect()
+                painter.setClipRect(rect)
+                painter.setCompositionMode(QPainter.CompositionMode_Clear)
+                painter.fillRect(rect, Qt.transparent)
+                painter.setCompositionMode(
+                    QPainter.CompositionMode_SourceOver)
+                self.sprites.draw(painter, level.get_intersecting(block))
+                rects.append(rect)
+            painter.end()
+            level.smashed.clear()
+        return rects
+
+    def draw(self, painter, rect):
+        painter.drawPixmap(rect, self.pixmap, rect)
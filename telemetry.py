@@ -0,0 +1,97 @@
+import struct
+import sys
+import threading
+from collections import Counter, namedtuple
+from events import RingBuffer
+from records import read_records, write_header
+
+MAGIC = b'ARKT'
+VERSION = 1
+RECORD = struct.Struct('<dBi')
+
+SMASH = 1
+BONUS_SPAWNED = 2
+BONUS_CAUGHT = 3
+DEATH = 4
+LEVEL_COMPLETED = 5
+DROPPED = 6
+KINDS = {SMASH: 'smash', BONUS_SPAWNED: 'bonus_spawned',
+         BONUS_CAUGHT: 'bonus_caught', DEATH: 'death',
+         LEVEL_COMPLETED: 'level_completed', DROPPED: 'dropped'}
+
+TELEMETRY_CAPACITY = 4096
+FLUSH_INTERVAL = 0.5
+
+Record = namedtuple('Record', ['tick', 'kind', 'value'])
+
+
+class TelemetryBuffer(RingBuffer):
+    def __init__(self, capacity=TELEMETRY_CAPACITY):
+        super().__init__(capacity)
+        self.data = bytearray(RECORD.size * capacity)
+        self.view = memoryview(self.data)
+
+    def emit(self, tick, kind, value=0):
+        tail = self.tail + 1
+        if tail == self.capacity:
+            tail = 0
+        if tail == self.head:
+            self.dropped += 1
+            return
+        RECORD.pack_into(self.data, self.tail * RECORD.size, tick, kind,
+                         value)
+        self.tail = tail
+
+    def read(self, start, end):
+        return bytes(self.view[start * RECORD.size:end * RECORD.size])
+
+
+class TelemetryWriter(threading.Thread):
+    def __init__(self, buffer, path, interval=FLUSH_INTERVAL):
+        super().__init__(daemon=True)
+        self.buffer = buffer
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.dropped = 0
+        self.written = 0
+
+    def run(self):
+        with open(self.path, 'ab') as file:
+            write_header(file, MAGIC, VERSION)
+            while not self.stopped.wait(self.interval):
+                self.flush(file)
+            self.flush(file)
+
+    def flush(self, file):
+        chunk = self.buffer.drain()
+        dropped = self.buffer.dropped
+        if dropped != self.dropped:
+            chunk += RECORD.pack(-1, DROPPED, dropped - self.dropped)
+            self.dropped = dropped
+        if chunk:
+            file.write(chunk)
+            file.flush()
+            self.written += len(chunk) // RECORD.size
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def read_telemetry(path):
+    for record in read_records(path, MAGIC, VERSION, RECORD, 'telemetry'):
+        yield Record(*record)
+
+
+def summarize(path):
+    totals = Counter()
+    for record in read_telemetry(path):
+        totals[KINDS.get(record.kind, record.kind)] += \
+            record.value if record.kind in (SMASH, DROPPED) else 1
+    return totals
+
+
+if __name__ == '__main__':
+    for name, total in sorted(summarize(sys.argv[1]).items()):
+        print('%-16s %d' % (name, total))
@@ -1,8 +1,42 @@
+import os.path
+import random
+import struct
+import tempfile
 import unittest
+from unittest import mock
 from math import pi
 import bonuses
 from core import Size, compare, sign
-from game import GameModel
+from env import ArkanoidEnv, VectorEnv
+from game import GameModel, TICK_PHASES
+from level import Level, LevelCreator, LevelRegistry, LEVELS
+from levelgen import LevelGenerator, generate_layout
+from levelpack import LevelPack, write_level_pack
+from loop import FixedStepLoop
+from replay import Replay, ReplayPlayer, ReplayRecorder
+from spectator import LocalSpectator, SpectatorServer
+import telemetry
+from scores import HighScores, Score, create_score, read_scores, RECORD
+
+try:
+    import numpy
+    from batch import BatchGameModel
+    from raster import Rasterizer, BACKGROUND, COLORS
+except ImportError:
+    numpy = None
+try:
+    from sound import QtVoice, SoundEngine, VoicePool
+except ImportError:
+    VoicePool = None
+try:
+    from PyQt5.QtCore import Qt, QRect, QSize
+    from PyQt5.QtGui import QImage, QPainter, QRegion
+    from PyQt5.QtWidgets import QApplication
+    from renderers import PainterRenderer, SceneRenderer
+    from sprites import SpriteAtlas
+except ImportError:
+    PainterRenderer = SceneRenderer = SpriteAtlas = None
+import events
 from entities import *
 
 
@@ -111,6 +145,809 @@ class LogicTest(unittest.TestCase):
 
         self.assertEqual(tuple(game.ship.location), (800, 475))
 
+    def test_spatial_index_matches_brute_force(self):
+        rnd = random.Random(42)
+        size = Size(1000, 1000)
+        for level in LevelCreator.get_levels(size).values():
+            for _ in range(300):
+                frame = Frame(rnd.uniform(-50, size.width),
+                              rnd.uniform(-50, size.height),
+                              rnd.choice([10, 25, 35, 200]),
+                              rnd.choice([20, 25, 35]))
+                expected = {block for block in level.blocks
+                            if block.frame.intersects_with(frame)}
+                self.assertEqual(level.grid.query(frame), expected)
+                if expected and rnd.random() > 0.5:
+                    level.remove_blocks({next(iter(expected))})
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_batch_model_matches_game_model(self):
+        size = Size(1000, 800)
+        game = GameModel(size)
+        batch = BatchGameModel(3, size, seed=0)
+        batch.bonus_chance = 1
+        game.release_ball()
+        batch.release_ball(numpy.ones(3, dtype=bool))
+
+        kinds = [bonuses.ExpandBonus, bonuses.FastBallBonus,
+                 bonuses.DecreaseBonus, bonuses.FireBallBonus]
+        spawned = []
+
+        def get_random_bonus(rng):
+            spawned.append(kinds[len(spawned) % len(kinds)])
+            return spawned[-1]
+
+        def integers(low, high, size):
+            kind = bonuses.BONUSES.index(kinds[integers.calls % len(kinds)])
+            integers.calls += 1
+            return numpy.full(size, list(batch.bonus_pool).index(kind))
+
+        integers.calls = 0
+        batch.rng = mock.Mock(random=numpy.ones, integers=integers)
+        for bonus_cls in kinds:
+            patcher = mock.patch.object(bonus_cls, 'duration', 60)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        with mock.patch.object(game.random, 'random', return_value=1), \
+                mock.patch.object(bonuses.Bonus, 'get_random_bonus',
+                                  get_random_bonus):
+            for _ in range(800):
+                target = game.ball.center.x - game.ship.width / 2
+                turn_rate = compare(target, game.ship.x) \
+                    if abs(target - game.ship.x) > 17 else 0
+                game.tick(turn_rate)
+                batch.step(turn_rate)
+
+                for i in range(batch.count):
+                    self.assertAlmostEqual(batch.ball[i, 0], game.ball.x, 3)
+                    self.assertAlmostEqual(batch.ball[i, 1], game.ball.y, 3)
+                    self.assertAlmostEqual(batch.ship_x[i], game.ship.x, 3)
+                    self.assertEqual(batch.ship_width[i], game.ship.width)
+                    self.assertEqual(batch.ball_velocity[i],
+                                     game.ball.velocity)
+                    self.assertEqual(batch.score[i], game.player.score)
+                    self.assertEqual(batch.alive[i].sum(),
+                                     len(game.level.blocks))
+        self.assertGreater(len(spawned), len(kinds))
+
+    def test_fixed_step_loop(self):
+        game = GameModel(Size(1000, 500))
+        game.release_ball()
+        loop = FixedStepLoop(game, step=12)
+
+        self.assertEqual(loop.advance(6), 0)
+        self.assertEqual(loop.advance(24), 2)
+        self.assertAlmostEqual(loop.alpha, 0.5)
+
+        old_x, old_y = loop.previous[game.ball]
+        x, y = loop.get_location(game.ball)
+        self.assertAlmostEqual(x, (old_x + game.ball.x) / 2)
+        self.assertAlmostEqual(y, (old_y + game.ball.y) / 2)
+
+        self.assertEqual(loop.advance(1000), loop.max_steps)
+        self.assertEqual(loop.accumulator, 0)
+
+    def test_sweep(self):
+        frame = Frame(0, 0, 10, 10)
+        self.assertEqual(frame.sweep(20, 0, Frame(15, 0, 10, 10)),
+                         (0.25, -1, 0))
+        self.assertEqual(frame.sweep(0, -40, Frame(0, -30, 10, 10)),
+                         (0.5, 0, 1))
+        self.assertIsNone(frame.sweep(20, 0, Frame(15, 20, 10, 10)))
+        self.assertIsNone(frame.sweep(-20, 0, Frame(15, 0, 10, 10)))
+
+    def test_swept_ball_does_not_tunnel(self):
+        for swept, smashed in ((False, 0), (True, 1)):
+            game = GameModel(Size(1000, 1000), swept)
+            block = Brick(400, 500)
+            game.level = Level(1, {block, Brick(0, 0)})
+            game.ball = Ball(430, 525)
+            game.ball.direction = Vector(0, -1)
+            game.ball.velocity = 80
+            game.tick()
+
+            self.assertEqual(len(game.level.smashed), smashed)
+            if swept:
+                self.assertGreater(game.ball.direction.y, 0)
+                self.assertEqual(game.ball.top, block.bottom + 75)
+
+    def test_swept_ball_simultaneous_contacts(self):
+        for _ in range(20):
+            left, right = Brick(400, 300), Brick(500, 300)
+            game = GameModel(Size(1000, 1000), swept=True)
+            game.level = Level(1, {right, left, Brick(0, 0)})
+            game.ball = Ball(480, 400)
+            game.ball.direction = Vector(0, -1)
+            game.ball.velocity = 100
+            game.tick()
+
+            self.assertEqual(game.level.smashed, {left})
+            self.assertIn(right, game.level.blocks)
+
+    def test_swept_ball_large_time_step(self):
+        games = [GameModel(Size(1000, 1000), swept=True) for _ in range(2)]
+        for game in games:
+            game.level = Level(1, {Brick(0, 0)})
+            game.ball = Ball(950, 300)
+            game.ball.direction = Vector(1, -1)
+        for _ in range(4):
+            games[0].tick()
+        games[1].tick(time_step=4)
+
+        self.assertAlmostEqual(games[0].ball.x, games[1].ball.x)
+        self.assertAlmostEqual(games[0].ball.y, games[1].ball.y)
+        self.assertLess(games[1].ball.direction.x, 0)
+
+    def test_replay(self):
+        game = GameModel(Size(1000, 800), seed=7)
+        recorder = ReplayRecorder(game)
+        recorder.move_ship_to(300)
+        recorder.release_ball()
+        for i in range(1500):
+            target = game.ball.center.x - game.ship.width / 2
+            if i % 50 == 0:
+                recorder.shooting()
+            if game.ball.state == BallState.Caught:
+                recorder.release_ball()
+            recorder.tick(compare(target, game.ship.x))
+
+        replay = Replay.from_bytes(recorder.replay.to_bytes())
+        self.assertEqual(len(replay), 1500)
+        player = ReplayPlayer(replay, keyframe_interval=100)
+        result = player.play()
+        self.assertEqual(result.player.score, game.player.score)
+        self.assertEqual(result.player.lives, game.player.lives)
+        self.assertEqual(tuple(result.ball.location),
+                         tuple(game.ball.location))
+
+        location = tuple(player.seek(1234).ball.location)
+        player.seek(10)
+        self.assertEqual(tuple(player.seek(1234).ball.location), location)
+        expected = ReplayPlayer(replay).play(1234)
+        self.assertEqual(location, tuple(expected.ball.location))
+        self.assertEqual(player.game.player.score, expected.player.score)
+        self.assertTrue(all(isinstance(keyframe, tuple)
+                            for keyframe in player.keyframes.values()))
+
+        with self.assertRaises(ValueError):
+            Replay(Size(1000, 800), -1)
+
+    def test_profiling(self):
+        games = [GameModel(Size(1000, 800), seed=3) for _ in range(2)]
+        profiler = games[1].enable_profiling(capacity=64)
+        for game in games:
+            game.release_ball()
+            for _ in range(200):
+                target = game.ball.center.x - game.ship.width / 2
+                game.tick(compare(target, game.ship.x))
+
+        self.assertEqual(games[0].player.score, games[1].player.score)
+        self.assertEqual(tuple(games[0].ball.location),
+                         tuple(games[1].ball.location))
+        self.assertEqual(profiler.timings['total'].count, 64)
+        summary = profiler.summary()
+        self.assertLessEqual(summary['total']['p50'],
+                             summary['total']['p99'])
+        self.assertGreater(summary['collision_tests']['p99'], 0)
+        self.assertEqual(set(profiler.timings),
+                         {name for name, _ in TICK_PHASES} | {'total'})
+        self.assertNotIn('query', vars(games[1].level.grid))
+
+        tests = []
+        for swept in (False, True):
+            game = GameModel(Size(1000, 1000), swept)
+            profiler = game.enable_profiling()
+            game.level = Level(1, {Brick(400, 500), Brick(0, 0)})
+            game.ball = Ball(430, 525)
+            game.ball.direction = Vector(0, -1)
+            game.ball.velocity = 80
+            game.tick()
+            tests.append(profiler.counters['collision_tests'].values[0])
+        self.assertEqual(tests[0], 1)
+        self.assertGreater(tests[1], tests[0])
+
+    def test_level_registry(self):
+        registry = LevelRegistry(LEVELS.directory)
+        game = GameModel(Size(1000, 800), levels=registry)
+        self.assertEqual(list(registry.layouts), [1])
+        self.assertEqual(len(game.level.blocks), 70)
+
+        game.level.remove_blocks(set(game.level.blocks))
+        game.tick()
+        self.assertEqual(game.current_level, 2)
+        self.assertEqual(sorted(registry.layouts), [1, 2])
+
+        restarted = GameModel(Size(1000, 800), levels=registry)
+        self.assertEqual(len(restarted.level.blocks), 70)
+        self.assertEqual(len(registry.levels), 2)
+
+    def test_level_pack(self):
+        size = Size(1000, 800)
+        registry = LevelRegistry(LEVELS.directory)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'levels.pack')
+            write_level_pack(path, {number: registry.get_layout(number)
+                                    for number in registry.paths})
+            pack = LevelPack(path)
+            self.assertEqual(len(pack), len(registry))
+
+            rnd = random.Random(5)
+            for number in registry.paths:
+                level = registry.get_level(number, size)
+                packed = pack.get_level(number, size)
+                self.assertEqual(
+                    {tuple(block.location) for block in packed.blocks},
+                    {tuple(block.location) for block in level.blocks})
+                for _ in range(300):
+                    frame = Frame(rnd.uniform(-50, size.width),
+                                  rnd.uniform(-50, size.height),
+                                  rnd.choice([10, 35, 200]), 35)
+                    expected = level.grid.query(frame)
+                    found = packed.grid.query(frame)
+                    self.assertEqual({tuple(b.location) for b in found},
+                                     {tuple(b.location) for b in expected})
+                    if found and rnd.random() > 0.5:
+                        packed.remove_blocks(found)
+                        level.remove_blocks(expected)
+                self.assertEqual(len(packed.blocks), len(level.blocks))
+                self.assertEqual(
+                    {tuple(block.location) for block in packed.smashed},
+                    {tuple(block.location) for block in level.smashed})
+                self.assertFalse(any(packed.is_alive(index) is False
+                                     for index in packed.bricks))
+                packed.smashed.clear()
+                self.assertFalse(packed.smashed)
+                self.assertEqual(len(packed.smashed), 0)
+
+            game = GameModel(size, seed=1, levels=pack)
+            game.release_ball()
+            for _ in range(500):
+                target = game.ball.center.x - game.ship.width / 2
+                game.tick(compare(target, game.ship.x))
+            self.assertGreater(game.player.score, 0)
+            del game
+            pack.close()
+
+    def test_level_generator(self):
+        size = Size(3000, 1200)
+        layout = generate_layout(7, 30, 40, 0.5, 'quad', 'blocks')
+        self.assertEqual(layout, generate_layout(7, 30, 40, 0.5, 'quad',
+                                                 'blocks'))
+        self.assertNotEqual(layout, generate_layout(8, 30, 40, 0.5, 'quad',
+                                                    'blocks'))
+        cells = set(layout.cells)
+        for i, j in cells:
+            self.assertIn((i, 39 - j), cells)
+            self.assertIn((29 - i, j), cells)
+
+        with tempfile.TemporaryDirectory() as directory:
+            levels = LevelGenerator(seed=3, count=2, density=0.7,
+                                    directory=directory)
+            self.assertIn(2, levels)
+            self.assertNotIn(3, levels)
+            first = levels.get_layout(1, size)
+            self.assertEqual(first.width, 30)
+            self.assertEqual(len(os.listdir(directory)), 1)
+            cached = LevelGenerator(seed=3, count=2, density=0.7,
+                                    directory=directory)
+            with mock.patch('levelgen.generate_layout') as generate:
+                self.assertEqual(cached.get_layout(1, size), first)
+                self.assertFalse(generate.called)
+            self.assertNotEqual(levels.get_layout(2, size), first)
+            self.assertEqual(len(os.listdir(directory)), 2)
+
+            path = cached.get_path(1, size)
+            with open(path, 'rb') as file:
+                data = file.read()
+            for corrupt in (b'', data[:3], b'XXXX' + data[4:], data[:-4]):
+                with open(path, 'wb') as file:
+                    file.write(corrupt)
+                self.assertEqual(cached.get_layout(1, size), first)
+                with open(path, 'rb') as file:
+                    self.assertEqual(file.read(), data)
+            self.assertEqual(len(os.listdir(directory)), 2)
+
+            game = GameModel(size, seed=1, levels=levels)
+            self.assertEqual(len(game.level.blocks), len(first.cells))
+
+    def test_bullet_pool(self):
+        game = GameModel(Size(1000, 500))
+        game.level = Level(1, {Brick(0, 0)})
+        game.ship.get_ammo(4)
+        game.shooting()
+        first = set(game.bullets)
+        self.assertEqual(len(first), 2)
+
+        while game.bullets:
+            game.tick()
+        self.assertEqual(len(game.bullet_pool.free), 2)
+
+        game.shooting()
+        self.assertEqual(set(game.bullets), first)
+        self.assertEqual(game.bullet_pool.free, [])
+
+        game.kill_player()
+        self.assertEqual(len(game.bullets), 0)
+        self.assertEqual(len(game.bullet_pool.free), 2)
+
+    def test_multiball(self):
+        game = GameModel(Size(1000, 500))
+        game.release_ball()
+        bonuses.MultiBallBonus(0, 0).activate(game)
+        self.assertEqual(len(game.balls), 3)
+        self.assertEqual(len({ball.direction.angle
+                              for ball in game.balls}), 3)
+
+        lost = game.balls[1]
+        lost.relocate(0, 500)
+        game.tick()
+        self.assertEqual(len(game.balls), 2)
+        self.assertNotIn(lost, game.balls)
+        self.assertGreater(lost.middle, game.deadly_height)
+        self.assertEqual([ball.index for ball in game.balls], [0, 1])
+        self.assertEqual(game.balls.x[1], game.balls[1].x)
+        self.assertEqual(game.player.lives, 3)
+
+        for ball in game.balls:
+            ball.relocate(0, 500)
+        game.tick()
+        self.assertEqual(len(game.balls), 1)
+        self.assertEqual(game.player.lives, 2)
+
+    def test_ball_array_stepping(self):
+        game = GameModel(Size(1000, 800))
+        game.level = Level(1, {Brick(-1000, -1000)})
+        game.release_ball()
+        rnd = random.Random(2)
+        while len(game.balls) < settings.MAX_BALLS:
+            ball = Ball(rnd.uniform(0, 960), rnd.uniform(0, 400))
+            ball.direction = Vector.from_angle(rnd.uniform(0, 2 * pi))
+            self.assertTrue(game.add_ball(ball))
+        self.assertFalse(game.add_ball(Ball()))
+
+        for _ in range(5):
+            clones = []
+            for ball in game.balls:
+                clone = Ball(ball.x, ball.y)
+                clone.direction = ball.direction
+                clone.state = ball.state
+                clones.append(clone)
+            game.move_balls(0)
+            for ball, clone in zip(game.balls, clones):
+                clone.move(0)
+                game.try_reflect_ball(clone)
+                self.assertEqual((ball.x, ball.y), (clone.x, clone.y))
+                self.assertEqual(ball.direction.angle, clone.direction.angle)
+
+    def test_vector_env(self):
+        actions = [[(tick + i) % 4 for i in range(3)] for tick in range(200)]
+        results = []
+        for workers in (0, 2):
+            with VectorEnv(3, seed=7, workers=workers, max_ticks=150) as envs:
+                trace = [envs.reset()]
+                for step in actions:
+                    trace.append(envs.step(step)[:3])
+                results.append(trace)
+        self.assertEqual(results[0], results[1])
+
+        env = ArkanoidEnv(seed=7, max_ticks=150)
+        self.assertEqual(env.reset(), results[0][0][0])
+        for tick, step in enumerate(actions):
+            observation, reward, done, _ = env.step(step[0])
+            self.assertEqual(reward, results[0][tick + 1][1][0])
+            if done:
+                self.assertEqual(tick, 149)
+                break
+
+    def test_snapshot_restore(self):
+        game = GameModel(Size(1000, 800), seed=3)
+        game.release_ball()
+        for _ in range(300):
+            game.tick(compare(game.ball.x, game.ship.x + 40))
+        snapshot = game.snapshot()
+        self.assertIs(game.snapshot().blocks, snapshot.blocks)
+
+        def play():
+            for tick in range(400):
+                game.tick(compare(game.ball.x, game.ship.x + 40))
+                if tick % 50 == 0:
+                    first = min(game.level.blocks,
+                                key=lambda block: (block.y, block.x))
+                    game.level.remove_blocks({first})
+                    game.try_get_bonus(game.ball)
+            return game.snapshot()
+
+        first = play()
+        self.assertNotEqual(first.blocks, snapshot.blocks)
+        game.restore(snapshot)
+        self.assertEqual(game.level.blocks, snapshot.blocks)
+        self.assertEqual(game.level.grid.query(game.frame),
+                         snapshot.blocks)
+        self.assertEqual(play(), first)
+        for _ in range(20):
+            game.restore(snapshot)
+            game.restore(first)
+        self.assertLessEqual(len(game.level.smashed), len(snapshot.blocks))
+
+    def test_snapshot_shared_across_idle_ticks(self):
+        game = GameModel(Size(1000, 500))
+        game.level = Level(1, {Brick(-1000, -1000)})
+        game.release_ball()
+        blocks = game.snapshot().blocks
+        game.tick()
+        self.assertIs(game.snapshot().blocks, blocks)
+
+    def test_spectator_deltas(self):
+        game = GameModel(Size(1000, 800), seed=5)
+        game.release_ball()
+        server = SpectatorServer(high_water=256)
+        fast, slow = LocalSpectator(), LocalSpectator()
+        server.add(fast)
+        server.add(slow)
+
+        def check(view):
+            self.assertEqual(view.score, game.player.score)
+            self.assertEqual(view.lives, game.player.lives)
+            self.assertEqual(len(view.get_bricks()), len(game.level.blocks))
+            self.assertEqual(len(view.entities),
+                             len(list(game.get_entities())))
+            ship = next(record for record in view.entities.values()
+                        if record[0] == 0)
+            self.assertAlmostEqual(ship[2], game.ship.x, 3)
+
+        sizes = []
+        for tick in range(400):
+            game.tick(compare(game.ball.x, game.ship.x + 40))
+            if tick % 100 == 0:
+                slow.receive()
+            server.publish(game)
+            sizes.append(fast.get_write_buffer_size())
+            self.assertEqual(fast.receive(), 1)
+            check(fast.view)
+            if tick % 100 == 0:
+                self.assertEqual(slow.receive(), 1)
+                check(slow.view)
+
+        spectators = {spectator.writer: spectator
+                      for spectator in server.spectators}
+        self.assertEqual(spectators[fast].dropped, 0)
+        self.assertGreater(spectators[slow].dropped, 300)
+        self.assertLess(max(sizes[1:]) * 4, sizes[0])
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_rasterizer(self):
+        game = GameModel(Size(1000, 800))
+        game.level = Level(1, {Brick(0, 0), Brick(900, 0)})
+        rasterizer = Rasterizer(game.size, 100, 80, sprites=False)
+        frame = rasterizer.render(game)
+        self.assertEqual(frame.shape, (80, 100, 3))
+
+        ship = game.ship
+        self.assertEqual(tuple(frame[79, int(ship.center.x / 10)]),
+                         COLORS['ship'])
+        self.assertEqual(tuple(frame[1, 5]), COLORS['brick'])
+        self.assertEqual(tuple(frame[1, 95]), COLORS['brick'])
+        self.assertEqual(tuple(frame[40, 50]), BACKGROUND)
+
+        game.level.remove_blocks({next(iter(game.level.grid.query(
+            Frame(0, 0, 10, 10))))})
+        rasterizer.render(game, frame)
+        self.assertEqual(tuple(frame[1, 5]), BACKGROUND)
+        self.assertEqual(tuple(frame[1, 95]), COLORS['brick'])
+
+    def test_game_events(self):
+        game = GameModel(Size(1000, 500))
+        game.level = Level(1, {Brick(0, 0), Brick(500, 0)})
+        game.destroy_blocks({next(iter(game.level.blocks))})
+        game.bonuses.add(bonuses.ExpandBonus(500, 460))
+        game.tick()
+        game.kill_player()
+        self.assertEqual(list(game.events.drain()),
+                         [events.BRICK, events.BONUS, events.DEATH])
+        self.assertEqual(len(game.events), 0)
+
+        queue = events.EventQueue(4)
+        for event in range(1, 6):
+            queue.emit(event)
+        self.assertEqual(list(queue.drain()), [1, 2, 3])
+        self.assertEqual(queue.dropped, 2)
+        queue.emit(7)
+        queue.emit(8)
+        self.assertEqual(list(queue.drain()), [7, 8])
+
+    @unittest.skipIf(VoicePool is None, 'PyQt5 is not installed')
+    def test_voice_stealing(self):
+        class Voice:
+            def __init__(self):
+                self.playing = None
+
+            def is_playing(self):
+                return self.playing is not None
+
+            def stop(self):
+                self.playing = None
+
+            def play(self, effect):
+                self.playing = effect
+
+        voices = [Voice(), Voice()]
+        pool = VoicePool(voices)
+        self.assertEqual(pool.play('brick', 1), 0)
+        self.assertEqual(pool.play('paddle', 2), 1)
+        self.assertEqual(pool.play('bonus', 3), 0)
+        self.assertEqual(pool.stolen, 1)
+        voices[1].stop()
+        self.assertEqual(pool.play('death', 4), 1)
+        self.assertEqual([voice.playing for voice in voices],
+                         ['bonus', 'death'])
+
+        class Effect:
+            def __init__(self, parent):
+                self.sources = []
+                self.plays = 0
+
+            def setSource(self, source):
+                self.sources.append(source)
+
+            def isPlaying(self):
+                return False
+
+            def play(self):
+                self.plays += 1
+
+        queue = events.EventQueue()
+        engine = SoundEngine(queue)
+        for event in (events.BRICK, events.PADDLE):
+            engine.sources[event] = str(event)
+            engine.pools[event] = VoicePool(
+                [QtVoice(Effect, None, str(event)) for _ in range(2)])
+        for event in (events.BRICK, events.PADDLE, events.BRICK):
+            queue.emit(event)
+            engine.drain()
+        effects = {event: [voice.effect for voice in pool.voices]
+                   for event, pool in engine.pools.items()}
+        self.assertEqual(sum(effect.plays
+                             for effect in effects[events.BRICK]), 2)
+        self.assertEqual(sum(effect.plays
+                             for effect in effects[events.PADDLE]), 1)
+        for event, pool_effects in effects.items():
+            for effect in pool_effects:
+                self.assertEqual(effect.sources, [str(event)])
+
+    @unittest.skipIf(SpriteAtlas is None, 'PyQt5 is not installed')
+    def test_sprite_atlas(self):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        LogicTest.app = QApplication.instance() or QApplication([])
+        sprites = SpriteAtlas()
+        ship = Ship()
+        ball = Ball(0, 40)
+        image = QImage(2000, 100, QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        for _ in range(5):
+            ship.expand()
+            ship.relocate(-ship.x, 0)
+            sprites.draw(painter, [ship, ball])
+        ball.change_state(BallState.Fiery)
+        sprites.draw(painter, [ship, ball])
+        painter.end()
+
+        region = sprites.get_region(ship.get_image(), ship.width,
+                                    ship.height)
+        self.assertEqual(region.width(), ship.width)
+        self.assertGreaterEqual(sprites.pixmap.width(), ship.width)
+        self.assertTrue(any(image.pixelColor(x, 12).alpha()
+                            for x in range(1100, int(ship.width))))
+        self.assertIn((ball.get_image(), 35, 35), sprites.regions)
+        self.assertEqual(len(sprites.scaled), len(sprites.regions))
+        self.assertEqual(len(sprites.regions), 7)
+
+    @unittest.skipIf(SceneRenderer is None, 'PyQt5 is not installed')
+    def test_scene_renderer(self):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        LogicTest.app = QApplication.instance() or QApplication([])
+        game = GameModel(Size(1000, 800), seed=1)
+        renderer = SceneRenderer(SpriteAtlas())
+        size = QSize(1000, 800)
+        get_location = lambda entity: entity.location
+        renderer.update(game, size, get_location)
+        self.assertEqual(len(renderer.bricks), len(game.level.blocks))
+        ball_item = renderer.items[game.ball][1]
+
+        snapshot = game.snapshot()
+        brick = min(game.level.blocks, key=lambda block: (block.y, block.x))
+        game.level.remove_blocks({brick})
+        game.ship.get_ammo(2)
+        game.shooting()
+        game.tick()
+        renderer.update(game, size, get_location)
+        self.assertNotIn(tuple(brick.location), renderer.bricks)
+        self.assertEqual(len(renderer.bricks), len(game.level.blocks))
+        self.assertIs(renderer.items[game.ball][1], ball_item)
+        self.assertEqual((ball_item.x(), ball_item.y()),
+                         tuple(game.ball.location))
+        self.assertEqual(len(renderer.items), 2 + len(game.bullets))
+
+        game.restore(snapshot)
+        renderer.update(game, size, get_location)
+        self.assertIn(tuple(brick.location), renderer.bricks)
+        self.assertEqual(len(renderer.items), 2)
+        self.assertEqual(sum(len(items) for items in renderer.free.values()),
+                         2)
+        self.assertEqual(len(renderer.scene.items()),
+                         len(game.level.blocks) + 4)
+
+    @unittest.skipIf(PainterRenderer is None, 'PyQt5 is not installed')
+    def test_painter_renderer_dirty_region(self):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        LogicTest.app = QApplication.instance() or QApplication([])
+        game = GameModel(Size(1000, 800), seed=1)
+        renderer = PainterRenderer(SpriteAtlas())
+        size = QSize(1000, 800)
+        get_location = lambda entity: entity.location
+
+        def aligned(entity):
+            return QRect(int(entity.x), int(entity.y), int(entity.width),
+                         int(entity.height))
+
+        def covers(region, rect):
+            return QRegion(rect).subtracted(region).isEmpty()
+
+        region = renderer.update(game, size, get_location)
+        self.assertTrue(covers(region, QRect(0, 0, 1000, 800)))
+
+        brick = min(game.level.blocks, key=lambda block: (block.y, block.x))
+        far = max(game.level.blocks, key=lambda block: (block.x, -block.y))
+        center = brick.center
+        game.level.remove_blocks({brick})
+        region = renderer.update(game, size, get_location)
+        self.assertTrue(covers(region, aligned(brick)))
+        self.assertFalse(region.intersects(aligned(far)))
+        self.assertTrue(covers(region, aligned(game.ball)))
+        self.assertTrue(covers(region, aligned(game.ship)))
+        image = renderer.brick_layer.pixmap.toImage()
+        self.assertEqual(image.pixelColor(int(center.x),
+                                          int(center.y)).alpha(), 0)
+        self.assertFalse(renderer.update(game, size, get_location)
+                         .intersects(aligned(brick)))
+
+        old = aligned(game.ball)
+        game.ball.location = (game.ball.x + 200, game.ball.y - 300)
+        new = aligned(game.ball)
+        region = renderer.update(game, size, get_location)
+        self.assertTrue(covers(region, old))
+        self.assertTrue(covers(region, new))
+        self.assertFalse(covers(region, QRect(0, 0, 1000, 800)))
+        self.assertFalse(region.intersects(aligned(far)))
+
+    def test_timed_effects(self):
+        game = GameModel(Size(1000, 500))
+        game.level = Level(1, {Brick(-1000, -1000)})
+        game.release_ball()
+        tick = game.tick
+        game.tick = lambda: tick(compare(game.ball.center.x,
+                                         game.ship.center.x))
+        width = game.ship.width
+        duration = bonuses.ExpandBonus.duration
+
+        bonuses.ExpandBonus(0, 0).activate(game)
+        game.tick()
+        bonuses.DecreaseBonus(0, 0).activate(game)
+        bonuses.FireBallBonus(0, 0).activate(game)
+        for _ in range(duration // 2):
+            game.tick()
+        bonuses.FireBallBonus(0, 0).activate(game)
+        self.assertEqual(len(game.effects), 4)
+
+        for _ in range(duration // 2 - 1):
+            game.tick()
+        self.assertEqual(len(game.effects), 3)
+        self.assertEqual(game.ball.state, BallState.Fiery)
+        game.tick()
+        self.assertEqual(len(game.effects), 1)
+        self.assertEqual(game.ship.width, width)
+        self.assertEqual(game.ball.state, BallState.Fiery)
+
+        for _ in range(duration // 2):
+            game.tick()
+        self.assertEqual(len(game.effects), 0)
+        self.assertEqual(game.ball.state, BallState.Free)
+
+        bonuses.ExpandBonus(0, 0).activate(game)
+        game.kill_player()
+        width = game.ship.width
+        for _ in range(duration + 1):
+            game.tick()
+        self.assertEqual(game.ship.width, width)
+
+    def test_telemetry(self):
+        buffer = telemetry.TelemetryBuffer(4)
+        for tick in range(5):
+            buffer.emit(tick, telemetry.SMASH, 1)
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(buffer.dropped, 2)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'game.telemetry')
+            game = GameModel(Size(1000, 500))
+            game.level = Level(1, {Brick(0, 0), Brick(500, 0)})
+            game.enable_telemetry(path, capacity=2)
+            with mock.patch.object(game.random, 'random', return_value=0):
+                game.destroy_blocks({next(iter(game.level.blocks))})
+            game.kill_player()
+            game.kill_player()
+            game.disable_telemetry()
+            records = list(telemetry.read_telemetry(path))
+
+        self.assertEqual(records, [
+            telemetry.Record(0, telemetry.SMASH, 1),
+            telemetry.Record(-1, telemetry.DROPPED, 2)])
+
+    def test_high_scores(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'scores')
+            scores = HighScores(path, size=3, compact_after=5)
+            ranks = [scores.add(Score(points, 1, 0, 10.0, points, tick))
+                     for tick, points in enumerate([50, 10, 70, 30, 70, 60])]
+            self.assertEqual(ranks, [1, 2, 1, 3, 2, 3])
+            self.assertEqual([score.score for score in scores], [70, 70, 60])
+            scores.flush()
+            self.assertEqual(len(list(read_scores(path))), 3)
+            scores.add(Score(20, 1, 0, 10.0, 0, 6))
+            scores.close()
+
+            reloaded = HighScores(path, size=3)
+            reloaded.flush()
+            self.assertEqual(list(reloaded), list(scores))
+            self.assertEqual(len(list(read_scores(path))), 4)
+
+            game = GameModel(Size(1000, 800), seed=-1)
+            game.won = True
+            game.current_level = len(game.levels) + 1
+            score = create_score(game, 1.0, 7)
+            self.assertEqual(score.level, len(game.levels))
+            self.assertEqual(score.seed, 2 ** 64 - 1)
+            with self.assertRaises(struct.error):
+                reloaded.add(Score(0, 1, 0, 1.0, -1, 8))
+            with mock.patch('builtins.open', side_effect=OSError):
+                reloaded.add(score)
+                reloaded.flush()
+            self.assertIsInstance(reloaded.error, OSError)
+            reloaded.add(score)
+            reloaded.flush()
+            self.assertTrue(reloaded.writer.is_alive())
+            self.assertEqual(list(read_scores(path))[-1], score)
+
+            replay_path = os.path.join(directory, 'last.replay')
+            replay = Replay(Size(1000, 800), 5)
+            reloaded.submit(replay.save, replay_path)
+            reloaded.close()
+            self.assertEqual(Replay.load(replay_path).seed, 5)
+
+            records = list(read_scores(path))
+            with open(path, 'ab') as file:
+                file.write(b'\0' * 5)
+            loaded = []
+            truncated = HighScores(path, size=3,
+                                   on_load=lambda: loaded.append(True))
+            truncated.add(Score(90, 1, 0, 1.0, 0, 9))
+            truncated.close()
+            self.assertEqual(loaded, [True])
+            self.assertEqual(list(read_scores(path))[:-1], records)
+            self.assertEqual(list(read_scores(path))[-1].score, 90)
+
+            for data in (b'AR', b'XXXX\x01' + b'\0' * RECORD.size):
+                with open(path, 'wb') as file:
+                    file.write(data)
+                corrupt = HighScores(path, size=3)
+                corrupt.flush()
+                self.assertEqual(list(corrupt), [])
+                self.assertIsInstance(corrupt.error, ValueError)
+                corrupt.add(Score(40, 1, 0, 1.0, 0, 10))
+                corrupt.close()
+                self.assertEqual([score.score for score in read_scores(path)],
+                                 [40])
+
 
 if __name__ == '__main__':
     unittest.main()